@@ -1,33 +1,22 @@
 from pathlib import Path
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from pypdf import PdfReader
-import re
-import time
 import json
 import os
 import sys
-import time
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 from chroma_client import chroma
 from embedding_client import embeddings as embeding
-from config import METADATA, SLEEP_SECONDS, CHUNK_SIZE, CHUNK_OVERLAP, BATCH_SIZE
+from config import METADATA, CHUNK_SIZE, CHUNK_OVERLAP
+from helpers.ingestion import sync_document
+from helpers.pdf_extract import extract_page_texts
+from exam.noise_filter import INGEST_NOISE, PDF_NOISE
+from helpers.mcq_parser import parse_mcq_output
 from generate.boe_topics import BOE_TOPICS
-import hashlib 
 
 # ------------------ Noise filters ------------------
-NOISE_KEYWORDS = [
-    "isbn", "nipo", "depósito legal", "sumario", "índice",
-    "boletín oficial", "agencia estatal", "www.boe.es",
-    "anexo", "tabla", "indemnización", "euros"
-]
-
 def looks_like_noise(text: str) -> bool:
-    t = text.lower()
-    if any(k in t for k in NOISE_KEYWORDS):
-        return True
-    digit_ratio = sum(c.isdigit() for c in text) / max(len(text), 1)
-    return digit_ratio > 0.30
+    return INGEST_NOISE.is_noise(text)
 
 def chunk_text(text: str):
     splitter = RecursiveCharacterTextSplitter(
@@ -52,34 +41,23 @@ def embed_batch(texts):
 
 def safe_json_load(text: str):
     """
-    Safely extract and parse JSON from LLM output.
+    Safely extract MCQ objects from LLM output.
     Supports:
     - Raw JSON
     - JSON wrapped in text
     - Objects or arrays
+    - Truncated output (complete questions are kept)
+    Returns the list of question dicts.
     """
     if not text or not isinstance(text, str):
         raise ValueError("Empty LLM response")
 
-    # Remove markdown fences if present
-    text = text.strip()
-    text = re.sub(r"^```json|```$", "", text, flags=re.I | re.M).strip()
-
-    # Try direct parse first
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        pass
-
-    # Fallback: extract first JSON object or array
-    match = re.search(r"(\{.*\}|\[.*\])", text, re.S)
-    if not match:
+    # Fences and surrounding prose are skipped; truncated output keeps
+    # every complete question instead of failing the whole response
+    mcqs = parse_mcq_output(text)
+    if not mcqs:
         raise ValueError("LLM did not return valid JSON")
-
-    try:
-        return json.loads(match.group(1))
-    except json.JSONDecodeError as e:
-        raise ValueError(f"JSON parse failed after extraction: {e}")
+    return mcqs
 
 
 # ------------------ Main ------------------
@@ -87,117 +65,75 @@ def perform_embeddings(PDF_PATH = "", ARTICLE_RE = None, lang = "en", collection
     if not collection_name:
         print(f"""Collection name not defined...""")
         return
-    reader = PdfReader(str(PDF_PATH))
-    buffer = ""
-    doc_counter = 0
     print(f"""Using Collection: {collection_name}""")
     collection = chroma.get_collection(collection_name)
     print("Starting BOE ingestion (memory-safe)...")
 
-    for page_idx, page in enumerate(reader.pages):
-        page_text = page.extract_text() or ""
-        if not page_text.strip():
-            continue
-
-        buffer += "\n" + page_text
-
-        # Plain-text ingestion (no article structure)
-        if ARTICLE_RE is None:
-            if len(buffer) >= 1500:
-                chunks = chunk_text(buffer)
-                buffer = ""
-
-                idx = 0
-                while idx < len(chunks):
-                    batch = chunks[idx : idx + BATCH_SIZE]
-                    embeddings = embed_batch(batch)
+    def records():
+        buffer = ""
+        collected = 0
 
-                    ids = [f"generic_{doc_counter + i}" for i in range(len(batch))]
-                    metadatas = [{"source": "PDF-en", "lang": lang}] * len(batch)
-
-                    collection.add(
-                        documents=batch,
-                        embeddings=embeddings,
-                        ids=ids,
-                        metadatas=METADATA,
-                    )
-
-                    doc_counter += len(batch)
-                    idx += len(batch)
-
-                    print(f"  added {doc_counter} generic chunks")
-                    time.sleep(SLEEP_SECONDS)
-
-            continue  # skip article logic entirely
-        
-        # Process complete articles only
-        matches = list(ARTICLE_RE.finditer(buffer))
-        if not matches:
-            continue
-
-
-        for m in matches[:-1]:
-            article_text = m.group(2).strip()
-            if len(article_text) < 400:
+        for page_idx, page_text in extract_page_texts(PDF_PATH):
+            if not page_text.strip():
                 continue
 
-            chunks = chunk_text(article_text)
+            buffer += "\n" + page_text
 
-            idx = 0
-            total = len(chunks)
+            # Plain-text ingestion (no article structure)
+            if ARTICLE_RE is None:
+                if len(buffer) >= 1500:
+                    chunks = chunk_text(buffer)
+                    buffer = ""
 
-            while idx < total:
-                batch = chunks[idx : idx + BATCH_SIZE]
-                embeddings = embed_batch(batch)
+                    for chunk in chunks:
+                        yield chunk, dict(METADATA)
+                    collected += len(chunks)
+                    print(f"  collected {collected} generic chunks")
 
-                ids = [f"boe_es_{doc_counter + i}" for i in range(len(batch))]
-                metadatas = [{
-                    "source": "BOE",
-                    "lang": "es"
-                }] * len(batch)
-                
-                collection.add(
-                    documents=batch,
-                    embeddings=embeddings,
-                    ids=ids,
-                    metadatas=metadatas
-                )
-
-                doc_counter += len(batch)
-                idx += len(batch)
+                continue  # skip article logic entirely
 
-                print(f"  added {doc_counter} chunks")
-                time.sleep(SLEEP_SECONDS)
+            # Process complete articles only
+            matches = list(ARTICLE_RE.finditer(buffer))
 
-        if not matches and len(buffer) > 1500:
-            chunks = chunk_text(buffer)
-            buffer = ""
+            # No article boundary yet: flush instead of letting the buffer (and
+            # the finditer rescans over it) grow with every page
+            if not matches and len(buffer) > 1500:
+                chunks = chunk_text(buffer)
+                buffer = ""
 
-            idx = 0
-            while idx < len(chunks):
-                batch = chunks[idx : idx + BATCH_SIZE]
-                embeddings = embed_batch(batch)
+                for chunk in chunks:
+                    yield chunk, {"source": "BOE", "lang": "es"}
+                collected += len(chunks)
+                print(f"  collected {collected} chunks (fallback)")
 
-                ids = [f"boe_es_fallback_{doc_counter + i}" for i in range(len(batch))]
-                metadatas = [{"source": "BOE", "lang": "es"}] * len(batch)
+            if not matches:
+                continue
 
-                collection.add(
-                    documents=batch,
-                    embeddings=embeddings,
-                    ids=ids,
-                    metadatas=metadatas,
-                )
+            for m in matches[:-1]:
+                article_text = m.group(2).strip()
+                if len(article_text) < 400:
+                    continue
 
-                doc_counter += len(batch)
-                idx += len(batch)
+                chunks = chunk_text(article_text)
 
-                print(f"  added {doc_counter} fallback chunks")
-                time.sleep(SLEEP_SECONDS)
+                for chunk in chunks:
+                    yield chunk, {"source": "BOE", "lang": "es"}
+                collected += len(chunks)
+                print(f"  collected {collected} chunks")
 
-        # keep unfinished article in buffer
-        buffer = matches[-1].group(1) + matches[-1].group(2)
+            # keep unfinished article in buffer
+            buffer = matches[-1].group(1) + matches[-1].group(2)
 
-    print(f"ingestion completed. Total chunks stored: {doc_counter}")
+    # Content-hash ids (helpers.ingestion): re-ingesting only embeds new or
+    # changed chunks. The first sync replaces the old positional
+    # generic_* / boe_es_* ids stored under the same source. Chunks stream
+    # page by page into the sync; only ids are kept for the stale check.
+    source = METADATA["source"] if ARTICLE_RE is None else "BOE"
+    stats = sync_document(
+        collection, os.path.basename(str(PDF_PATH)), records(),
+        legacy_where={"source": source},
+    )
+    print(f"ingestion completed. Total chunks stored: {stats['total']}")
 
 def normalize_boe_mcqs(raw):
     if not raw:
@@ -290,28 +226,8 @@ def translate_mcq(mcq):
     return json.loads(rsp.choices.message.content.strip())
 
 def extract_pdf_text(pdf_path: Path) -> str:
-    reader = PdfReader(str(pdf_path))
-    pages = []
-    for i, page in enumerate(reader.pages):
-        text = page.extract_text() or ""
-        if text.strip():
-            pages.append(text)
-        if i % 25 == 0:
-            print(f"  extracted page {i}")
+    pages = [text for _, text in extract_page_texts(pdf_path) if text.strip()]
     return "\n".join(pages)
 
-def make_document_id(path: str) -> str:
-    return hashlib.sha256(path.encode("utf-8")).hexdigest()[:16]
-
 def is_noise(text: str) -> bool:
-    noise_markers = [
-        "thank you for downloading",
-        "disclaimer",
-        "introduction",
-        "email",
-        "www.",
-        "http",
-        "copyright",
-    ]
-    t = text.lower()
-    return any(m in t for m in noise_markers)
\ No newline at end of file
+    return PDF_NOISE.is_noise(text)
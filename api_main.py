@@ -1,17 +1,30 @@
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import JSONResponse
+import json
 
-app = FastAPI(title="Adaptive Traffic Theory Exam API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in every worker: open the shared read-only data before the
+    # first request instead of inside it
+    from exam.question_bank import bank
+    import exam.exam_engine  # noqa: F401  (retriever, indexes)
+
+    bank.load()
+    yield
+
+
+app = FastAPI(title="Adaptive Traffic Theory Exam API", lifespan=lifespan)
 
 limiter = Limiter(key_func=get_remote_address)
 
@@ -57,32 +70,108 @@ class ExamRequest(BaseModel):
     level: str = "medium"
 
 class SubmitRequest(BaseModel):
-    exam: list
-    answers: list
-    level: str
+    token: str
+    answers: list[str | None]
+
+class ExplainRequest(BaseModel):
+    token: str
+    index: int
+    answer: str
+
+def read_submission(req: SubmitRequest):
+    """
+    Returns (question_ids, level, None) or (None, None, error_response).
+    """
+    from exam.exam_token import InvalidExamToken, read_token
+    from exam.question_bank import bank
+
+    try:
+        ids, level = read_token(req.token, bank.load().size, bank.digest)
+    except InvalidExamToken as e:
+        return None, None, JSONResponse(status_code=400, content={"error": str(e)})
+
+    if len(ids) != len(req.answers):
+        return None, None, JSONResponse(
+            status_code=400,
+            content={"error": "Answer count does not match exam length"}
+        )
+
+    return ids, level, None
 
 # ---------- ROUTES ----------
 @app.post("/api/exam")
 @limiter.limit("10/minute")
-def new_exam(request: Request, req: ExamRequest):
-    from exam.exam_engine import generate_exam
-    return {"exam": generate_exam(req.level)}
+async def new_exam(request: Request, req: ExamRequest):
+    from exam.exam_engine import sample_exam_ids, public_question
+    from exam.exam_token import issue_token
+    from exam.question_bank import bank
+
+    ids = sample_exam_ids(req.level)
+    return {
+        "exam": [public_question(q) for q in bank.get(ids)],
+        "token": issue_token(ids, req.level, bank.digest),
+    }
 
 @app.post("/api/submit")
 @limiter.limit("10/minute")
-def submit(request: Request, req: SubmitRequest):
-    from exam.exam_engine import grade_exam, next_level
+async def submit(request: Request, req: SubmitRequest):
+    from exam.exam_engine import agrade_exam, next_level
+    from exam.question_bank import bank
 
-    if len(req.exam) != len(req.answers):
-        raise ValueError("Answer count does not match exam length")
+    ids, level, error = read_submission(req)
+    if error:
+        return error
 
-    score, details = grade_exam(req.exam, req.answers)
+    # Grade against the server-side bank, never against client data
+    score, details = await agrade_exam(bank.get(ids), req.answers)
 
     return {
         "score": score,
-        "next_level": next_level(score, req.level),
+        "next_level": next_level(score, level),
         "details": details,
     }
+
+@app.post("/api/submit/stream")
+@limiter.limit("10/minute")
+async def submit_stream(request: Request, req: SubmitRequest):
+    from exam.exam_engine import astream_grade_exam
+    from exam.question_bank import bank
+
+    ids, level, error = read_submission(req)
+    if error:
+        return error
+
+    # NDJSON: score first, then one line per explanation as it resolves
+    async def events():
+        async for event in astream_grade_exam(bank.get(ids), req.answers, level):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/api/explain")
+@limiter.limit("30/minute")
+async def explain(request: Request, req: ExplainRequest):
+    from exam.exam_engine import normalize_answer
+    from exam.exam_token import InvalidExamToken, read_token
+    from exam.explanation_service import explanations
+    from exam.question_bank import bank
+
+    try:
+        ids, _ = read_token(req.token, bank.load().size, bank.digest)
+    except InvalidExamToken as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    if not 0 <= req.index < len(ids):
+        return JSONResponse(status_code=400, content={"error": "Invalid question index"})
+
+    q = bank.get([ids[req.index]])[0]
+
+    # The answer ends up in the prompt and the cache key: only wrong options
+    answer = normalize_answer(q, req.answer)
+    if answer is None or answer == q.get("correct_answer"):
+        return JSONResponse(status_code=400, content={"error": "Invalid answer"})
+
+    return {"explanation": await explanations.explain(q, answer)}
 # Serve React index.html
 # @app.get("/")
 # def serve_frontend():
@@ -97,16 +186,4 @@ app.mount(
 )
 
 
-import uvicorn
-
-if __name__ == "__main__":
-    uvicorn.run(
-        "api_main:app",
-        host="192.168.0.27",
-        port=8900,
-        ssl_certfile="/home/aamir/certs/a1m918.crt",
-        ssl_keyfile="/home/aamir/certs/a1m918.key",
-    )
-
-
-# uvicorn main:app --host 192.168.0.27 --port 8900
\ No newline at end of file
+# python serve.py   (host / port / workers / TLS from config)
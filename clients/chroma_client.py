@@ -1,8 +1,16 @@
 # llm_client.py
+import threading
+
 import chromadb
-from chromadb.utils import embedding_functions
 from pathlib import Path
-from config import EMBEDDING_MODEL, OPENAI_API_BASE,OPENAI_API_KEY
+from config import (
+    EMBEDDING_MODEL,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_TTL,
+    EMBEDDING_CACHE_PATH,
+)
+from clients.embedding_cache import CachedEmbeddingFunction
+from clients.embedding_client import embeddings
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 VECTORSTORE_DIR = BASE_DIR / "vectorstore" / "chroma"
@@ -12,19 +20,20 @@ VECTORSTORE_DIR.mkdir(parents=True, exist_ok=True)
 class ChromaClient:
     _instance = None
     _client = None
+    _lock = threading.Lock()
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
 
-            embedding_fn = embedding_functions.OpenAIEmbeddingFunction(
-                api_base=OPENAI_API_BASE,
-                api_key=OPENAI_API_KEY,
-                model_name=EMBEDDING_MODEL
-            )
-
-            cls._client = chromadb.PersistentClient(
-                path=str(VECTORSTORE_DIR)
+            # Query texts are re-embedded constantly; serve repeats from cache.
+            # Misses go through EmbeddingClient and its shared HTTP pool
+            embedding_fn = CachedEmbeddingFunction(
+                embeddings.embed,
+                model_name=EMBEDDING_MODEL,
+                max_size=EMBEDDING_CACHE_SIZE,
+                ttl=EMBEDDING_CACHE_TTL,
+                path=EMBEDDING_CACHE_PATH,
             )
 
             cls._embedding_fn = embedding_fn
@@ -33,16 +42,28 @@ class ChromaClient:
 
     @property
     def client(self):
+        # Opened on first use: processes serving from the NumPy export or
+        # the prebuilt indexes never load Chroma's SQLite / HNSW files
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    ChromaClient._client = chromadb.PersistentClient(
+                        path=str(VECTORSTORE_DIR)
+                    )
         return self._client
 
     def get_collection(self, name: str):
-        return self._client.get_or_create_collection(
+        return self.client.get_or_create_collection(
             name=name,
             embedding_function=self._embedding_fn
         )
 
+    @property
+    def embedding_fn(self):
+        return self._embedding_fn
+
     def list_collections(self):
-        return self._client.list_collections()
+        return self.client.list_collections()
 
 
 # -------- Global singleton --------
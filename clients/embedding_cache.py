@@ -0,0 +1,157 @@
+# embedding_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from chromadb import Documents, EmbeddingFunction, Embeddings
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Wraps a Chroma embedding function with a bounded LRU + TTL cache.
+    Entries are keyed by (model, sha256 of the whitespace-normalized text)
+    and can optionally be persisted to a SQLite file. Disk writes are
+    batched and run on a single writer thread, so callers (including the
+    event loop) never wait on SQLite; the table is capped at max_size.
+    """
+
+    def __init__(self, inner, model_name: str, max_size: int = 10000,
+                 ttl: float = 86400, path: str = ""):
+        self._inner = inner
+        self._model = model_name
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()  # key -> (created_at, embedding)
+        self._lock = threading.Lock()
+        self._db = None
+        self._writer = None
+
+        self.hits = 0
+        self.misses = 0
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, created_at REAL, embedding TEXT)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_created ON embeddings (created_at)"
+            )
+            self._load_from_disk()
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-cache")
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{self._model}:{digest}"
+
+    def _load_from_disk(self):
+        cutoff = time.time() - self._ttl
+        rows = self._db.execute(
+            "SELECT key, created_at, embedding FROM embeddings "
+            "WHERE created_at >= ? ORDER BY created_at DESC LIMIT ?",
+            (cutoff, self._max_size),
+        ).fetchall()
+        for key, created_at, embedding in reversed(rows):
+            self._entries[key] = (created_at, json.loads(embedding))
+        self._db.execute("DELETE FROM embeddings WHERE created_at < ?", (cutoff,))
+        self._prune()
+        self._db.commit()
+
+    def _prune(self):
+        # Keep only the newest max_size rows, like the in-memory LRU
+        self._db.execute(
+            "DELETE FROM embeddings WHERE key NOT IN "
+            "(SELECT key FROM embeddings ORDER BY created_at DESC LIMIT ?)",
+            (self._max_size,),
+        )
+
+    def _write(self, rows: list):
+        self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+        self._prune()
+        self._db.commit()
+
+    def lookup(self, text: str):
+        """
+        Returns the cached embedding for text, or None on miss / expiry.
+        """
+        key = self._key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            created_at, embedding = entry
+            if time.time() - created_at > self._ttl:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def store(self, text: str, embedding):
+        self.store_many([(text, embedding)])
+
+    def store_many(self, items):
+        """
+        Caches (text, embedding) pairs; persisted in one background write.
+        """
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, embedding in items:
+                key = self._key(text)
+                embedding = [float(x) for x in embedding]
+                self._entries[key] = (now, embedding)
+                self._entries.move_to_end(key)
+                rows.append((key, now, json.dumps(embedding)))
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+        if self._writer is not None and rows:
+            self._writer.submit(self._write, rows)
+
+    def flush(self):
+        """
+        Waits for pending disk writes.
+        """
+        if self._writer is not None:
+            self._writer.submit(lambda: None).result()
+
+    def __call__(self, input: Documents) -> Embeddings:
+        results = [self.lookup(text) for text in input]
+
+        # Embed only the misses, once per distinct cache key
+        missing = {}
+        for text, emb in zip(input, results):
+            if emb is None:
+                missing.setdefault(self._key(text), text)
+        if missing:
+            texts = list(missing.values())
+            embedded = self._inner(texts)
+            self.store_many(zip(texts, embedded))
+            fresh = {key: [float(x) for x in e] for key, e in zip(missing, embedded)}
+            results = [
+                emb if emb is not None else fresh[self._key(text)]
+                for text, emb in zip(input, results)
+            ]
+
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -1,12 +1,13 @@
 # embedding_client.py
-import openai
-from openai import OpenAI
-
-client = OpenAI(api_key=OPENAI_API_KEY)
+from openai import OpenAI, AsyncOpenAI
 from config import OPENAI_API_BASE, OPENAI_API_KEY, EMBEDDING_MODEL
+from clients.http_transport import http_client, async_http_client
 
-# TODO: The 'openai.api_base' option isn't read in the client API. You will need to pass it when you instantiate the client, e.g. 'OpenAI(base_url=OPENAI_API_BASE)'
-# openai.api_base = OPENAI_API_BASE
+# Same pooled transport as the LLM client
+client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_API_BASE,
+                http_client=http_client, max_retries=0)
+aclient = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_API_BASE,
+                      http_client=async_http_client, max_retries=0)
 
 class EmbeddingClient:
     _instance = None
@@ -19,6 +20,11 @@ class EmbeddingClient:
     def embed(self, texts: list[str]) -> list[list[float]]:
         rsp = client.embeddings.create(model=EMBEDDING_MODEL,
         input=texts)
-        return [d["embedding"] for d in rsp.data]
+        return [d.embedding for d in rsp.data]
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        rsp = await aclient.embeddings.create(model=EMBEDDING_MODEL,
+        input=texts)
+        return [d.embedding for d in rsp.data]
 
 embeddings = EmbeddingClient()
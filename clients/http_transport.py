@@ -0,0 +1,216 @@
+# http_transport.py
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from config import (
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_MAX_RETRIES,
+    HTTP_RETRY_BASE,
+    HTTP_RETRY_MAX,
+    HTTP_RETRY_BUDGET,
+    LLM_TIMEOUT,
+    EMBEDDING_TIMEOUT,
+)
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    # httpx only negotiates HTTP/2 when the h2 package is installed
+    HTTP2 = False
+
+# 429 and connect-phase errors mean the server never processed the request,
+# so any call may be replayed. Other failures may come after the server
+# started work: replaying a POST /chat/completions would generate (and
+# bill) twice, so those are retried only for replayable requests.
+RETRY_ALWAYS_STATUSES = {429}
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+RETRY_ERRORS = NOT_SENT_ERRORS + (httpx.RemoteProtocolError, httpx.ReadError)
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# POST endpoints without side effects: same input, same output
+REPLAYABLE_PATHS = ("/embeddings",)
+
+# Read timeout per endpoint: generation can take minutes, embeddings cannot
+ENDPOINT_TIMEOUTS = {
+    "/chat/completions": LLM_TIMEOUT,
+    "/completions": LLM_TIMEOUT,
+    "/embeddings": EMBEDDING_TIMEOUT,
+}
+
+
+class RetryBudget:
+    """
+    Caps retries to a share of recent traffic: every request deposits
+    `ratio` tokens (up to `capacity`), every retry spends one. When the
+    server is down, retries stop multiplying the load instead of piling on.
+    """
+
+    def __init__(self, ratio: float = HTTP_RETRY_BUDGET, capacity: float = 10.0):
+        self.ratio = ratio
+        self.capacity = capacity
+        self._tokens = capacity
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+
+# Client-wide default; the OpenAI SDK forwards it on every request unless
+# a per-call timeout was given
+DEFAULT_TIMEOUT = httpx.Timeout(LLM_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+
+def timeout_for(request: httpx.Request) -> httpx.Timeout:
+    path = request.url.path
+    read = next((t for suffix, t in ENDPOINT_TIMEOUTS.items() if path.endswith(suffix)), LLM_TIMEOUT)
+    return httpx.Timeout(read, connect=HTTP_CONNECT_TIMEOUT)
+
+
+def _apply_timeout(request: httpx.Request):
+    # Per-endpoint timeout only where the caller kept the default
+    if request.extensions.get("timeout") in (None, DEFAULT_TIMEOUT.as_dict()):
+        request.extensions["timeout"] = timeout_for(request).as_dict()
+
+
+def _replayable(request: httpx.Request) -> bool:
+    return request.method in IDEMPOTENT_METHODS or request.url.path.endswith(REPLAYABLE_PATHS)
+
+
+def _retry_error(request: httpx.Request, error: Exception) -> bool:
+    return isinstance(error, NOT_SENT_ERRORS) or _replayable(request)
+
+
+def _retry_status(request: httpx.Request, status: int) -> bool:
+    if status in RETRY_ALWAYS_STATUSES:
+        return True
+    return status in RETRY_STATUSES and _replayable(request)
+
+
+def _retry_after(response: httpx.Response) -> float:
+    value = response.headers.get("retry-after")
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return 0.0
+
+
+def _delay(attempt: int, retry_after: float = 0.0) -> float:
+    # Full jitter: uniform in [0, min(max, base * 2^attempt)]
+    backoff = random.uniform(0, min(HTTP_RETRY_MAX, HTTP_RETRY_BASE * 2 ** attempt))
+    return max(backoff, min(retry_after, HTTP_RETRY_MAX))
+
+
+class RetryTransport(httpx.HTTPTransport):
+    """
+    Pooled transport with per-endpoint timeouts and jittered exponential
+    retry, within a budget, on failures that are safe to replay.
+    """
+
+    def __init__(self, budget: RetryBudget, max_retries: int = HTTP_MAX_RETRIES, **kwargs):
+        super().__init__(**kwargs)
+        self.budget = budget
+        self.max_retries = max_retries
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        _apply_timeout(request)
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                response = super().handle_request(request)
+            except RETRY_ERRORS as e:
+                if (not _retry_error(request, e)
+                        or attempt >= self.max_retries or not self.budget.withdraw()):
+                    raise
+                time.sleep(_delay(attempt))
+                attempt += 1
+                continue
+
+            if (not _retry_status(request, response.status_code)
+                    or attempt >= self.max_retries or not self.budget.withdraw()):
+                return response
+            retry_after = _retry_after(response)
+            response.close()
+            time.sleep(_delay(attempt, retry_after))
+            attempt += 1
+
+
+class AsyncRetryTransport(httpx.AsyncHTTPTransport):
+    """
+    Async variant of RetryTransport; sleeps without blocking the loop.
+    """
+
+    def __init__(self, budget: RetryBudget, max_retries: int = HTTP_MAX_RETRIES, **kwargs):
+        super().__init__(**kwargs)
+        self.budget = budget
+        self.max_retries = max_retries
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        _apply_timeout(request)
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                response = await super().handle_async_request(request)
+            except RETRY_ERRORS as e:
+                if (not _retry_error(request, e)
+                        or attempt >= self.max_retries or not self.budget.withdraw()):
+                    raise
+                await asyncio.sleep(_delay(attempt))
+                attempt += 1
+                continue
+
+            if (not _retry_status(request, response.status_code)
+                    or attempt >= self.max_retries or not self.budget.withdraw()):
+                return response
+            retry_after = _retry_after(response)
+            await response.aclose()
+            await asyncio.sleep(_delay(attempt, retry_after))
+            attempt += 1
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+# -------- Shared clients --------
+# One pool per process for the LLM, embedding and Chroma embedding paths;
+# pass as http_client=... with max_retries=0 so retries happen only here
+retry_budget = RetryBudget()
+
+http_client = httpx.Client(
+    transport=RetryTransport(retry_budget, http2=HTTP2, limits=_limits()),
+    timeout=DEFAULT_TIMEOUT,
+)
+
+async_http_client = httpx.AsyncClient(
+    transport=AsyncRetryTransport(retry_budget, http2=HTTP2, limits=_limits()),
+    timeout=DEFAULT_TIMEOUT,
+)
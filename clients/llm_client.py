@@ -1,15 +1,21 @@
 # llm_client.py
-# import openai
-from openai import OpenAI
+import openai
+from openai import OpenAI, AsyncOpenAI
 from config import (
     OPENAI_API_BASE,
     OPENAI_API_KEY,
     LLM_MODEL,
     LLM_MAX_TOKENS,
     LLM_TEMPERATURE,
+    LLM_STRUCTURED_OUTPUT,
 )
+from clients.http_transport import http_client, async_http_client
 
-client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_API_BASE)
+# Shared pooled transport; it owns retries and per-endpoint timeouts
+client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_API_BASE,
+                http_client=http_client, max_retries=0)
+aclient = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_API_BASE,
+                      http_client=async_http_client, max_retries=0)
 
 class LLMClient:
     _instance = None
@@ -17,15 +23,91 @@ class LLMClient:
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
+            cls._instance._structured = LLM_STRUCTURED_OUTPUT
         return cls._instance
 
-    def chat(self, messages):
-        return client.chat.completions.create(model=LLM_MODEL,
-        messages=messages,
+    def _options(self, response_format, stream: bool = False):
+        options = dict(model=LLM_MODEL,
         temperature=LLM_TEMPERATURE,
         max_tokens=LLM_MAX_TOKENS,
-        stream=False,
-        timeout=120)
+        stream=stream)
+        if response_format is not None and self._structured:
+            options["response_format"] = response_format
+        return options
+
+    def _unsupported(self, error, response_format) -> bool:
+        # Servers without structured output reject the field: fall back to
+        # plain decoding for the rest of the process
+        if response_format is None or not self._structured:
+            return False
+        if "response_format" not in str(error) and "json_schema" not in str(error):
+            return False
+        print(f"[WARN] Structured output not supported, disabling: {error}")
+        self._structured = False
+        return True
+
+    def chat(self, messages, response_format=None):
+        """
+        `response_format` (e.g. a JSON schema) constrains decoding when
+        the server supports it.
+        """
+        try:
+            return client.chat.completions.create(messages=messages,
+            **self._options(response_format))
+        except openai.BadRequestError as e:
+            if not self._unsupported(e, response_format):
+                raise
+            return client.chat.completions.create(messages=messages,
+            **self._options(None))
+
+    async def achat(self, messages, response_format=None):
+        try:
+            return await aclient.chat.completions.create(messages=messages,
+            **self._options(response_format))
+        except openai.BadRequestError as e:
+            if not self._unsupported(e, response_format):
+                raise
+            return await aclient.chat.completions.create(messages=messages,
+            **self._options(None))
+
+    def stream(self, messages, response_format=None):
+        """
+        Yields content deltas as the server decodes them.
+        Closing the generator early closes the HTTP stream, which stops
+        decoding on the server.
+        """
+        try:
+            stream = client.chat.completions.create(messages=messages,
+            **self._options(response_format, stream=True))
+        except openai.BadRequestError as e:
+            if not self._unsupported(e, response_format):
+                raise
+            stream = client.chat.completions.create(messages=messages,
+            **self._options(None, stream=True))
+        try:
+            for chunk in stream:
+                for choice in chunk.choices:
+                    if choice.delta and choice.delta.content:
+                        yield choice.delta.content
+        finally:
+            stream.close()
+
+    async def astream(self, messages, response_format=None):
+        try:
+            stream = await aclient.chat.completions.create(messages=messages,
+            **self._options(response_format, stream=True))
+        except openai.BadRequestError as e:
+            if not self._unsupported(e, response_format):
+                raise
+            stream = await aclient.chat.completions.create(messages=messages,
+            **self._options(None, stream=True))
+        try:
+            async for chunk in stream:
+                for choice in chunk.choices:
+                    if choice.delta and choice.delta.content:
+                        yield choice.delta.content
+        finally:
+            await stream.close()
 
 # Global singleton
 llm = LLMClient()
@@ -12,6 +12,7 @@ EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
 
 LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "800"))
 LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.3"))
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "true").lower() == "true"  # send JSON schemas as response_format
 SLEEP_SECONDS = float(os.getenv("SLEEP_SECONDS", "0.5"))
 
 # ------------------ Safety parameters ------------------
@@ -19,11 +20,68 @@ CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "500"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
 BATCH_SIZE = int(os.getenv("BATCH_SIZE", "1"))
 
+# ----------------- Ingestion throughput -----------------
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "8000"))  # token budget per embedding request
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "64"))  # max chunks per embedding request
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))  # embedding requests in flight
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "1000"))  # chunks per Chroma upsert
+
+# ----------------- LLM explanations -----------------
+# In-flight calls to the model server across all API workers; each worker
+# gets an equal share (at least one), see WORKER_LLM_CONCURRENCY
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
+
+# ----------------- Serving -----------------
+HOST = os.getenv("HOST", "127.0.0.1")
+PORT = int(os.getenv("PORT", "8900"))
+WORKERS = int(os.getenv("WORKERS", "1"))  # uvicorn worker processes
+WORKER_LLM_CONCURRENCY = max(1, LLM_MAX_CONCURRENCY // max(WORKERS, 1))
+SSL_CERTFILE = os.getenv("SSL_CERTFILE", "")  # empty = plain HTTP
+SSL_KEYFILE = os.getenv("SSL_KEYFILE", "")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # bytes mapped per read-only DB
+
+# ----------------- Exam tokens -----------------
+EXAM_TOKEN_SECRET = os.getenv("EXAM_TOKEN_SECRET", "")
+EXAM_TOKEN_TTL = int(os.getenv("EXAM_TOKEN_TTL", "7200"))  # seconds
+
+# ----------------- HTTP transport -----------------
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "32"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "16"))  # idle connections kept open
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))  # seconds
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_RETRY_BASE = float(os.getenv("HTTP_RETRY_BASE", "0.25"))  # seconds, doubled per attempt
+HTTP_RETRY_MAX = float(os.getenv("HTTP_RETRY_MAX", "10"))
+HTTP_RETRY_BUDGET = float(os.getenv("HTTP_RETRY_BUDGET", "0.2"))  # retries allowed per request
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))  # read timeout for chat completions
+EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", "30"))
+
+# ----------------- Embedding cache -----------------
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "86400"))  # seconds
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")  # empty = memory only
+
+# ----------------- Retrieval -----------------
+RETRIEVAL_MAX_RESULTS = int(os.getenv("RETRIEVAL_MAX_RESULTS", "8"))  # upper bound on n_results
+RETRIEVAL_EMA_ALPHA = float(os.getenv("RETRIEVAL_EMA_ALPHA", "0.2"))  # weight of the latest pass rate
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))  # reciprocal rank fusion constant
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "chroma")  # "chroma" or "numpy" (exported mmap index)
+NUMPY_INDEX_DTYPE = os.getenv("NUMPY_INDEX_DTYPE", "float32")  # "float32" or "int8"
+
 # ----------------- Quiz Parameters -----------------
 WINDOW_SIZE = int(os.getenv("WINDOW_SIZE", "2"))
 MCQS_PER_WINDOW = int(os.getenv("MCQS_PER_WINDOW", "5"))
 SLEEP_SECONDS = float(os.getenv("SLEEP_SECONDS", "0.2"))
 
+# ----------------- MCQ generation pipeline -----------------
+MCQ_GEN_CONCURRENCY = int(os.getenv("MCQ_GEN_CONCURRENCY", "4"))  # in-flight LLM requests
+MCQ_GEN_QUEUE_SIZE = int(os.getenv("MCQ_GEN_QUEUE_SIZE", "16"))
+MCQ_GEN_MAX_RETRIES = int(os.getenv("MCQ_GEN_MAX_RETRIES", "3"))
+MCQ_GEN_STREAMING = os.getenv("MCQ_GEN_STREAMING", "true").lower() == "true"  # consume questions as they are decoded
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.92"))  # cosine similarity to reject a question
+
 METADATA = {
     "lang": "en",          # or "es"
     "source": "N332",
@@ -0,0 +1,270 @@
+from array import array
+from collections import Counter, defaultdict
+import heapq
+import json
+import math
+import re
+import sqlite3
+import threading
+import unicodedata
+
+from clients.chroma_client import VECTORSTORE_DIR
+from config import BM25_K1, BM25_B, HYBRID_RRF_K, SQLITE_MMAP_SIZE
+
+# Stored beside the Chroma store so both are rebuilt / shipped together
+BM25_FILE = VECTORSTORE_DIR.parent / "bm25.sqlite3"
+
+# Keeps codes such as "s-53", "r-101", "b1" and "3.5" as single terms
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    "a al con de del el en es la las lo los o para por que se su sus un una y "
+    "the of and to in is for on or an be by".split()
+)
+
+READ_CHUNK = 500  # rows per documents lookup
+
+
+def _strip_accents(text: str) -> str:
+    return "".join(
+        c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c)
+    )
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lowercased, accent-folded terms; hyphenated codes are indexed whole
+    ("s-53"), joined ("s53") and by part ("s", "53") so any spelling matches.
+    """
+    terms = []
+    for token in TOKEN_RE.findall(_strip_accents(text.lower())):
+        if token not in STOPWORDS:
+            terms.append(token)
+        if "-" in token:
+            terms.append(token.replace("-", ""))
+            terms.extend(p for p in token.split("-") if p and p not in STOPWORDS)
+    return terms
+
+
+def _matches(meta: dict, where) -> bool:
+    # Equality and $and / $or: the subset build_where produces
+    if not where:
+        return True
+    if "$and" in where:
+        return all(_matches(meta, w) for w in where["$and"])
+    if "$or" in where:
+        return any(_matches(meta, w) for w in where["$or"])
+    return all(meta.get(key) == value for key, value in where.items())
+
+
+def build_bm25_index(collection, path=BM25_FILE, page_size: int = 5000) -> int:
+    """
+    Builds the inverted index over every chunk in the collection and
+    swaps it in atomically. Returns the number of indexed chunks.
+    """
+    tmp = path.with_suffix(".tmp")
+    tmp.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(tmp)
+    conn.execute(
+        "CREATE TABLE chunks (idx INTEGER PRIMARY KEY, id TEXT NOT NULL, "
+        "document TEXT NOT NULL, metadata TEXT NOT NULL, length INTEGER NOT NULL)"
+    )
+    conn.execute("CREATE TABLE postings (term TEXT PRIMARY KEY, docs BLOB, tfs BLOB)")
+
+    postings = defaultdict(lambda: (array("I"), array("I")))
+    idx = 0
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["documents", "metadatas"], limit=page_size, offset=offset
+        )
+        if not page["ids"]:
+            break
+        rows = []
+        for id_, doc, meta in zip(page["ids"], page["documents"], page["metadatas"]):
+            counts = Counter(tokenize(doc))
+            for term, tf in counts.items():
+                docs, tfs = postings[term]
+                docs.append(idx)
+                tfs.append(tf)
+            rows.append((idx, id_, doc, json.dumps(meta or {}, ensure_ascii=False),
+                         sum(counts.values())))
+            idx += 1
+        conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?)", rows)
+        offset += len(page["ids"])
+
+    conn.executemany(
+        "INSERT INTO postings VALUES (?, ?, ?)",
+        ((term, docs.tobytes(), tfs.tobytes()) for term, (docs, tfs) in postings.items()),
+    )
+    conn.commit()
+    conn.close()
+
+    # Atomic swap so a running server never sees a half-written index
+    tmp.replace(path)
+    print(f"[BM25] Indexed {idx} chunks, {len(postings)} terms -> {path}")
+    return idx
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the ingested chunks.
+
+    Lengths and metadata are held in memory; postings and chunk texts stay
+    in the mmap'd SQLite file and are read only for the query terms and
+    the hits returned, so API workers share them through the page cache.
+    The file is reloaded when a rebuild replaces it.
+    """
+
+    def __init__(self, path=BM25_FILE, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        self._conn = None
+
+    @property
+    def available(self) -> bool:
+        return self.path.exists()
+
+    def _ensure_loaded(self) -> bool:
+        if not self.path.exists():
+            return False
+        mtime = self.path.stat().st_mtime_ns
+        if mtime == self._loaded_mtime:
+            return True
+
+        with self._lock:
+            if mtime == self._loaded_mtime:
+                return True
+
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+            lengths = array("I")
+            ids, metadatas = [], []
+            for _, id_, meta, length in conn.execute(
+                "SELECT idx, id, metadata, length FROM chunks ORDER BY idx"
+            ):
+                ids.append(id_)
+                metadatas.append(json.loads(meta))
+                lengths.append(length)
+
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = conn
+            self._ids = ids
+            self._metadatas = metadatas
+            self._lengths = lengths
+            self._avgdl = (sum(lengths) / len(lengths)) if lengths else 0.0
+            self._loaded_mtime = mtime
+        return True
+
+    def _idf(self, df: int) -> float:
+        n = len(self._ids)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _postings(self, terms: list[str]) -> dict:
+        if not terms:
+            return {}
+        placeholders = ",".join("?" * len(terms))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT term, docs, tfs FROM postings WHERE term IN ({placeholders})", terms
+            ).fetchall()
+        postings = {}
+        for term, docs, tfs in rows:
+            d, t = array("I"), array("I")
+            d.frombytes(docs)
+            t.frombytes(tfs)
+            postings[term] = (d, t)
+        return postings
+
+    def _score(self, query: str, where=None) -> dict[int, float]:
+        scores = defaultdict(float)
+        k1, b, avgdl, lengths = self.k1, self.b, self._avgdl or 1.0, self._lengths
+
+        for docs, tfs in self._postings(list(set(tokenize(query)))).values():
+            idf = self._idf(len(docs))
+            for doc, tf in zip(docs, tfs):
+                norm = k1 * (1 - b + b * lengths[doc] / avgdl)
+                scores[doc] += idf * tf * (k1 + 1) / (tf + norm)
+
+        if where:
+            metadatas = self._metadatas
+            return {d: s for d, s in scores.items() if _matches(metadatas[d], where)}
+        return scores
+
+    def _documents(self, rows: list[int]) -> dict[int, str]:
+        found = {}
+        with self._lock:
+            for i in range(0, len(rows), READ_CHUNK):
+                part = rows[i:i + READ_CHUNK]
+                placeholders = ",".join("?" * len(part))
+                found.update(self._conn.execute(
+                    f"SELECT idx, document FROM chunks WHERE idx IN ({placeholders})", part
+                ).fetchall())
+        return found
+
+    def search(self, queries: list[str], n_results: int, where=None) -> dict:
+        """
+        Same result shape as collection.query: {"ids", "documents",
+        "metadatas", "distances"} with one list per query. Distances are
+        negated BM25 scores so lower is better, as in Chroma.
+        """
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if not self._ensure_loaded():
+            for key in results:
+                results[key] = [[] for _ in queries]
+            return results
+
+        ranked = []
+        for query in queries:
+            scores = self._score(query, where)
+            ranked.append(heapq.nlargest(n_results, scores.items(), key=lambda kv: kv[1]))
+
+        texts = self._documents(sorted({d for hits in ranked for d, _ in hits}))
+        for hits in ranked:
+            results["ids"].append([self._ids[d] for d, _ in hits])
+            results["documents"].append([texts[d] for d, _ in hits])
+            results["metadatas"].append([self._metadatas[d] for d, _ in hits])
+            results["distances"].append([-s for _, s in hits])
+        return results
+
+
+def _column(result: dict, key: str, q: int) -> list:
+    rows = result.get(key) or []
+    return (rows[q] if q < len(rows) else None) or []
+
+
+def rrf_merge(*results: dict, k: int = HYBRID_RRF_K) -> dict:
+    """
+    Reciprocal rank fusion of several collection.query-shaped results.
+    Each chunk scores sum(1 / (k + rank)) over the lists it appears in;
+    the output keeps the same shape with fused scores as negative distances.
+    """
+    n_queries = max(len(r.get("ids") or []) for r in results)
+    fused = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+
+    for q in range(n_queries):
+        scores = defaultdict(float)
+        payload = {}
+        for result in results:
+            ids = _column(result, "ids", q)
+            docs = _column(result, "documents", q) or [None] * len(ids)
+            metas = _column(result, "metadatas", q) or [None] * len(ids)
+            for rank, (id_, doc, meta) in enumerate(zip(ids, docs, metas), start=1):
+                scores[id_] += 1.0 / (k + rank)
+                payload.setdefault(id_, (doc, meta))
+
+        order = sorted(scores, key=scores.get, reverse=True)
+        fused["ids"].append(order)
+        fused["documents"].append([payload[i][0] for i in order])
+        fused["metadatas"].append([payload[i][1] for i in order])
+        fused["distances"].append([-scores[i] for i in order])
+    return fused
+
+
+# -------- Global singleton --------
+bm25 = BM25Index()
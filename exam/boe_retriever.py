@@ -1,12 +1,31 @@
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import re
 from clients.chroma_client import chroma
+from clients.embedding_client import embeddings
+from clients.embedding_cache import normalize_text
+from exam.noise_filter import BOE_NOISE
+from exam.retrieval_filters import AdaptiveFetch, build_where
+from exam.bm25_index import bm25, rrf_merge
+from exam.single_flight import SingleFlight, AsyncSingleFlight
+from config import RETRIEVAL_MAX_RESULTS, RETRIEVAL_BACKEND
 
 # BASE_DIR = Path(__file__).resolve().parent.parent
 # VECTORSTORE_DIR = BASE_DIR / "vectorstore" / "chroma"
 
-client = chroma.client
-collection = client.get_collection("pdf_docs")
+if RETRIEVAL_BACKEND == "numpy":
+    from exam.numpy_index import NumpyIndex
+
+    # Static export of pdf_docs: mmap'd matrix, batched queries in one matmul
+    collection = NumpyIndex(chroma.embedding_fn)
+else:
+    # Go through the wrapper so queries use the cached embedding function
+    collection = chroma.get_collection("pdf_docs")
+
+# Dedicated pool for blocking Chroma searches so they never compete with
+# the web server's own threadpool
+_query_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="chroma-query")
 
 
 # Reject numeric tables, annexes, compensation schedules
@@ -27,81 +46,204 @@ BAD_PATTERNS = [
 #             return True
 #     return False
 
-import re
-
 def looks_like_noise(text: str) -> bool:
-    t = text.lower()
-
-    # --- Hard noise keywords (pure metadata / admin) ---
-    noise_keywords = [
-        "isbn",
-        "nipo",
-        "depósito legal",
-        "catálogo de publicaciones",
-        "sumario",
-        "índice",
-        "boletín oficial del estado",
-        "agencia estatal",
-        "www.boe.es",
-        "avenida de",
-        "280",
-        "resolución de",
-        "dirección general de tráfico",
-        "medidas especiales de regulación",
-        "punto de acceso nacional",
-    ]
-
-    if any(k in t for k in noise_keywords):
-        return True
-
-    # --- Index / TOC patterns ---
-    # Dot leaders with page numbers
-    if re.search(r"\.{5,}\s*\d+", text):
-        return True
-
-    # Big numeric tables (compensation charts, annexes)
-    digit_ratio = sum(c.isdigit() for c in text) / max(len(text), 1)
-    if digit_ratio > 0.45:
-        return True
-
-    # Administrative annexes / registries (NOT driving rules)
-    if re.search(r"\banexo\b|\bregistro\b|\bconsorcio\b", t):
-        return True
-
-    # TOO SHORT to be meaningful
-    if len(text) < 120:
-        return True
-
-    return False
-
-
-
-def get_boe_explanation(question_text: str, n_results: int = 8) -> str:
-    print("BOE query:", question_text)
+    return BOE_NOISE.is_noise(text)
 
-    results = collection.query(
-        query_texts=[question_text],
-        n_results=n_results,
-    )
 
-    docs = results.get("documents", [[]])[0]
+_noise_flagged = None
+_fetch = AdaptiveFetch()
+
+# Identical concurrent retrievals (same normalized text and parameters)
+# share one embedding + query instead of each hitting the backends
+_flights = SingleFlight()
+_aflights = AsyncSingleFlight()
+
+
+def retrieval_flight_stats() -> dict:
+    return {"sync": dict(_flights.stats), "async": dict(_aflights.stats)}
+
+
+def has_noise_flags() -> bool:
+    """
+    True only when every chunk carries the per-chunk noise flag (synced
+    through helpers.ingestion, or backfilled with helpers/reflag_noise.py).
+    With a partial set, {"noise": False} would silently drop every chunk
+    that lacks the key, so older collections are filtered in Python.
+    """
+    global _noise_flagged
+    if _noise_flagged is None:
+        flagged = collection.get(
+            where={"$or": [{"noise": False}, {"noise": True}]}, include=[]
+        )["ids"]
+        total = collection.count()
+        _noise_flagged = total > 0 and len(flagged) == total
+    return _noise_flagged
+
+
+def retrieval_where(filters: dict = None):
+    """
+    where clause for structured filters (source, lang, topic, article).
+    Noise is excluded in Chroma whenever the collection carries the flag.
+    """
+    filters = dict(filters or {})
+    if has_noise_flags():
+        filters.setdefault("noise", False)
+    return build_where(**filters)
 
-    clean_snippets = []
 
+def usable_snippets(docs: list[str]) -> list[str]:
+    clean = []
     for d in docs:
         d = d.replace("\n", " ").strip()
+        if not looks_like_noise(d):
+            # Keep only meaningful rule text
+            clean.append(d[:800])
+    return clean
+
+
+def clean_snippets(docs: list[str], max_snippets: int = 2) -> str:
+    # We only want 1–2 solid references
+    return "\n\n".join(usable_snippets(docs)[:max_snippets])
+
+
+def _query_args(filters: dict, n_results: int, max_snippets: int) -> dict:
+    where = retrieval_where(filters)
+    args = {"n_results": _fetch.n_results(where, max_snippets, n_results)}
+    if where is not None:
+        args["where"] = where
+    return args
+
+
+def _collect(unique: list[str], results: dict, where, max_snippets: int) -> dict:
+    docs_per_query = results.get("documents") or [[] for _ in unique]
+    by_text = {}
+    for text, docs in zip(unique, docs_per_query):
+        docs = docs or []
+        usable = usable_snippets(docs)
+        _fetch.observe(where, len(docs), len(usable))
+        by_text[text] = "\n\n".join(usable[:max_snippets])
+    return by_text
+
+
+def _flight_keys(question_texts: list[str], n_results: int, filters: dict,
+                 max_snippets: int) -> dict:
+    """
+    Maps each text to its single-flight key; texts differing only in
+    whitespace share a key (and one retrieval), like the embedding cache.
+    """
+    params = (n_results, max_snippets, tuple(sorted((k, repr(v)) for k, v in (filters or {}).items())))
+    return {t: (normalize_text(t), *params) for t in dict.fromkeys(question_texts)}
+
+
+def _query_explanations(unique: list[str], n_results: int, filters: dict,
+                        max_snippets: int) -> dict:
+    args = _query_args(filters, n_results, max_snippets)
+    results = collection.query(query_texts=unique, **args)
+    if bm25.available:
+        # Exact terms (sign codes, article numbers) the embeddings miss
+        results = rrf_merge(results, bm25.search(unique, args["n_results"], args.get("where")))
+    return _collect(unique, results, args.get("where"), max_snippets)
+
+
+def get_boe_explanations(question_texts: list[str], n_results: int = RETRIEVAL_MAX_RESULTS,
+                         filters: dict = None, max_snippets: int = 2) -> list[str]:
+    """
+    Batched variant of get_boe_explanation.
+    Duplicate texts are retrieved once; all unique texts are embedded and
+    searched in a single collection.query call, fused with BM25 hits
+    when the keyword index has been built. Texts another thread is already
+    retrieving with the same parameters wait for that result instead.
+
+    `filters` takes source / lang / topic / article and is applied by
+    Chroma; `n_results` is only an upper bound, the actual candidate
+    count follows the observed filter pass rate.
+    """
+    keys = _flight_keys(question_texts, n_results, filters, max_snippets)
+    if not keys:
+        return []
+
+    print(f"BOE batch query: {len(keys)} unique / {len(question_texts)} total")
+
+    texts = {}
+    for t, k in keys.items():
+        texts.setdefault(k, t)
+
+    def fetch(own: list) -> dict:
+        by_text = _query_explanations([texts[k] for k in own], n_results, filters, max_snippets)
+        return {k: by_text[texts[k]] for k in own}
+
+    by_key = _flights.do_batch(list(texts), fetch)
+    return [by_key[keys[t]] for t in question_texts]
+
+
+def get_boe_explanation(question_text: str, n_results: int = RETRIEVAL_MAX_RESULTS,
+                        filters: dict = None) -> str:
+    print("BOE query:", question_text)
+    return get_boe_explanations([question_text], n_results=n_results, filters=filters)[0]
+
+
+async def aembed_queries(texts: list[str]) -> list[list[float]]:
+    """
+    Embeds query texts without blocking the event loop.
+    Shares the ChromaClient embedding cache with the sync path.
+    """
+    cache = chroma.embedding_fn
+    vectors = [cache.lookup(t) for t in texts]
+
+    missing = [t for t, v in zip(texts, vectors) if v is None]
+    if missing:
+        fresh = dict(zip(missing, await embeddings.aembed(missing)))
+        # One batched cache write, persisted off the event loop
+        cache.store_many(fresh.items())
+        vectors = [v if v is not None else fresh[t] for t, v in zip(texts, vectors)]
+
+    return vectors
+
+
+async def _aquery_explanations(unique: list[str], n_results: int, filters: dict,
+                               max_snippets: int) -> dict:
+    query_embeddings = await aembed_queries(unique)
+
+    loop = asyncio.get_running_loop()
+    args = await loop.run_in_executor(
+        _query_pool, lambda: _query_args(filters, n_results, max_snippets)
+    )
+    vector = loop.run_in_executor(
+        _query_pool,
+        lambda: collection.query(query_embeddings=query_embeddings, **args),
+    )
+    if bm25.available:
+        keyword = loop.run_in_executor(
+            _query_pool,
+            lambda: bm25.search(unique, args["n_results"], args.get("where")),
+        )
+        results = rrf_merge(*await asyncio.gather(vector, keyword))
+    else:
+        results = await vector
+
+    return _collect(unique, results, args.get("where"), max_snippets)
+
+
+async def aget_boe_explanations(question_texts: list[str], n_results: int = RETRIEVAL_MAX_RESULTS,
+                                filters: dict = None, max_snippets: int = 2) -> list[str]:
+    """
+    Async variant of get_boe_explanations; concurrent requests for the
+    same text share one in-flight retrieval.
+    """
+    keys = _flight_keys(question_texts, n_results, filters, max_snippets)
+    if not keys:
+        return []
 
-        print(len(d), d[:80])
-        if looks_like_noise(d):
-            continue
+    texts = {}
+    for t, k in keys.items():
+        texts.setdefault(k, t)
 
-        # Keep only meaningful rule text
-        clean_snippets.append(d[:800])
+    async def fetch(own: list) -> dict:
+        by_text = await _aquery_explanations([texts[k] for k in own], n_results, filters, max_snippets)
+        return {k: by_text[texts[k]] for k in own}
 
-        # We only want 1–2 solid references
-        if len(clean_snippets) == 2:
-            break
-    return "\n\n".join(clean_snippets)
+    by_key = await _aflights.do_batch(list(texts), fetch)
+    return [by_key[keys[t]] for t in question_texts]
 
 # def get_boe_explanation(question_text: str, n_results: int = 2) -> str:
 #     """
@@ -177,39 +319,39 @@ def get_boe_explanation(question_text: str, n_results: int = 8) -> str:
 
 
 # def retrieve_boe_context(question_text: str, n_results: int = 3) -> str:
-    """
-    Retrieve raw BOE legal context for a question.
-    This function MUST NOT generate explanations.
-    """
+#     """
+#     Retrieve raw BOE legal context for a question.
+#     This function MUST NOT generate explanations.
+#     """
 
-    # results = collection.query(
-    #     query_texts=[question_text],
-    #     n_results=n_results,
-    # )
+#     # results = collection.query(
+#     #     query_texts=[question_text],
+#     #     n_results=n_results,
+#     # )
 
-    results = collection.query(
-        query_texts=[question_text],
-        n_results=n_results,
-        where={
-            "$and": [
-                {"source": "BOE_Codigo_Trafico"},
-                {"type": "law"}
-            ]
-        }
-    )    
+#     results = collection.query(
+#         query_texts=[question_text],
+#         n_results=n_results,
+#         where={
+#             "$and": [
+#                 {"source": "BOE_Codigo_Trafico"},
+#                 {"type": "law"}
+#             ]
+#         }
+#     )    
 
 
-    docs = results.get("documents", [[]])[0]
+#     docs = results.get("documents", [[]])[0]
 
-    if not docs:
-        return ""
+#     if not docs:
+#         return ""
 
-    # Light cleanup only (NO summarizing here)
-    cleaned = []
-    for d in docs:
-        text = d.replace("\n", " ").strip()
-        if len(text) > 1200:
-            text = text[:1200]
-        cleaned.append(text)
+#     # Light cleanup only (NO summarizing here)
+#     cleaned = []
+#     for d in docs:
+#         text = d.replace("\n", " ").strip()
+#         if len(text) > 1200:
+#             text = text[:1200]
+#         cleaned.append(text)
 
-    return "\n\n".join(cleaned)
\ No newline at end of file
+#     return "\n\n".join(cleaned)
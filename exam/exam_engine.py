@@ -1,20 +1,15 @@
-import json
-import random
-from pathlib import Path
-from exam.boe_retriever import get_boe_explanation
+import asyncio
+from exam.boe_retriever import get_boe_explanations, aget_boe_explanations
+from exam.explanation_index import lookup_explanations
+from exam.question_bank import bank
 
-MCQ_FILE = Path(__file__).resolve().parent.parent / "data" / "mcqs" / "eng_big_mcqs.json"
-mcqs = json.loads(MCQ_FILE.read_text(encoding="utf-8"))
+# Retrieval texts per batched lookup while streaming: small enough that
+# the first explanations arrive early, large enough to keep batching
+STREAM_BATCH = 4
 
-def bucket_by_difficulty():
-    buckets = {"easy": [], "medium": [], "hard": []}
-    for q in mcqs:
-        buckets[q.get("difficulty", "medium")].append(q)
-    return buckets
-
-def generate_exam(level="medium", n=30):
-    buckets = bucket_by_difficulty()
+EXPLANATION_UNAVAILABLE = "Explanation unavailable right now."
 
+def sample_exam_ids(level="medium", n=30):
     if level == "easy":
         weights = {"easy": 0.7, "medium": 0.3, "hard": 0.0}
     elif level == "hard":
@@ -22,96 +17,145 @@ def generate_exam(level="medium", n=30):
     else:  # medium
         weights = {"easy": 0.3, "medium": 0.5, "hard": 0.2}
 
-    exam = []
-    for diff, w in weights.items():
-        count = int(n * w)
-        exam.extend(random.sample(buckets[diff], min(count, len(buckets[diff]))))
+    return bank.sample_ids(weights, n)
 
-    while len(exam) < n:
-        exam.append(random.choice(mcqs))
+def generate_exam(level="medium", n=30):
+    return bank.get(sample_exam_ids(level, n))
 
-    random.shuffle(exam)
-    return exam[:n]
+def public_question(q):
+    # What the client needs to render a question; answers stay server-side
+    return {"question": q.get("question"), "options": q.get("options")}
 
-def generate_boe_explanation(
-    question_text: str,
-    user_answer: str,
-    correct_answer: str,
-) -> str:
+def normalize_answer(q, answer):
     """
-    Generate a short, exam-style explanation grounded in BOE law.
+    Returns the option key an answer refers to, or None if q has no such
+    option. List options are keyed by letter ("A", "B", ...) and also
+    accept their position ("0", "1", ...), which is what the UI sends.
     """
-
-    boe_context = retrieve_boe_context(question_text)
-
-    if not boe_context:
-        return "According to traffic regulations, the selected answer does not comply with the correct rule."
-
-    prompt = f"""
-You are a Spanish driving theory instructor.
-
-Using ONLY the legal reference below, explain why the user's answer is wrong
-and what the correct rule is.
-
-Legal reference (BOE):
-{boe_context}
-
-Question:
-{question_text}
-
-User's answer:
-{user_answer}
-
-Correct answer:
-{correct_answer}
-
-Rules:
-- Write 3 to 5 short sentences
-- Do NOT quote legal text verbatim
-- Do NOT mention article numbers
-- Do NOT include administrative or procedural law
-- Explain in clear, exam-oriented language
-"""
-
-    response = client.chat.completions.create(
-        model="Mistral-7B-Instruct-v0.3-GGUF",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
+    options = q.get("options") or {}
+    if isinstance(options, dict):
+        return answer if answer in options else None
+    letters = [chr(ord("A") + i) for i in range(len(options))]
+    if answer in letters:
+        return answer
+    if answer.isascii() and answer.isdigit() and int(answer) < len(letters):
+        return letters[int(answer)]
+    return None
+
+def build_retrieval_text(q):
+    # Build a richer retrieval query
+    return (
+        q.get("question_es")
+        or f"{q.get('question')} Correct answer: {q.get('correct_answer')}"
     )
 
-    return response.choices[0].message.content.strip()
-
-def grade_exam(exam, answers):
+def _score_exam(exam, answers):
+    """
+    Scores answers and resolves explanations from the prebuilt index.
+    Returns (score, results, misses) where misses still need live retrieval.
+    """
     score = 0
     results = []
+    wrong = []
 
     for q, a in zip(exam, answers):
         correct = q.get("correct_answer")
         if correct is None:
             raise ValueError("Question missing correct answer")
 
-        ok = a == correct
+        # The UI sends positions for list options; compare option keys
+        ok = a is not None and normalize_answer(q, a) == correct
 
         if ok:
             score += 1
-            explanation = ""
         else:
-            # Build a richer retrieval query
-            retrieval_text = (
-                q.get("question_es")
-                or f"{q.get('question')} Correct answer: {correct}"
-            )
-
-            explanation = get_boe_explanation(retrieval_text)
+            wrong.append((len(results), q))
 
         results.append({
             "correct": ok,
             "difficulty": q.get("difficulty", "medium"),
-            "explanation": explanation
+            "explanation": ""
         })
 
+    # Precomputed explanations first, live retrieval only for index misses
+    indexed = lookup_explanations([q.get("question", "") for _, q in wrong])
+    misses = []
+    for idx, q in wrong:
+        if q.get("question") in indexed:
+            results[idx]["explanation"] = indexed[q["question"]]
+        else:
+            misses.append((idx, q))
+
+    return score, results, misses
+
+def grade_exam(exam, answers):
+    score, results, misses = _score_exam(exam, answers)
+
+    # One batched retrieval for every remaining wrong answer
+    explanations = get_boe_explanations([build_retrieval_text(q) for _, q in misses])
+    for (idx, _), explanation in zip(misses, explanations):
+        results[idx]["explanation"] = explanation
+
     return score, results
 
+async def agrade_exam(exam, answers):
+    score, results, misses = _score_exam(exam, answers)
+
+    explanations = await aget_boe_explanations([build_retrieval_text(q) for _, q in misses])
+    for (idx, _), explanation in zip(misses, explanations):
+        results[idx]["explanation"] = explanation
+
+    return score, results
+
+
+async def astream_grade_exam(exam, answers, level):
+    """
+    Yields the score event as soon as grading is done, then one
+    explanation event per wrong answer as its retrieval resolves.
+    Retrieval texts are looked up in batches of STREAM_BATCH; a failed
+    batch yields explanation events flagged with "error".
+    """
+    score, results, misses = _score_exam(exam, answers)
+
+    yield {
+        "type": "score",
+        "score": score,
+        "next_level": next_level(score, level),
+        "details": results,
+    }
+
+    # Identical retrieval texts share one lookup
+    by_text = {}
+    for idx, q in misses:
+        by_text.setdefault(build_retrieval_text(q), []).append(idx)
+    texts = list(by_text)
+
+    async def resolve(batch):
+        try:
+            return batch, await aget_boe_explanations(batch)
+        except Exception as e:
+            print(f"[WARN] Retrieval failed for {len(batch)} explanations: {e}")
+            return batch, None
+
+    tasks = [
+        asyncio.ensure_future(resolve(texts[i:i + STREAM_BATCH]))
+        for i in range(0, len(texts), STREAM_BATCH)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            batch, explanations = await next_done
+            for j, text in enumerate(batch):
+                for idx in by_text[text]:
+                    if explanations is None:
+                        yield {"type": "explanation", "index": idx,
+                               "explanation": EXPLANATION_UNAVAILABLE, "error": True}
+                    else:
+                        yield {"type": "explanation", "index": idx, "explanation": explanations[j]}
+    finally:
+        # Client gone (or generator closed early): stop the remaining lookups
+        for task in tasks:
+            task.cancel()
+
 
 def next_level(score, current):
     if score >= 26:
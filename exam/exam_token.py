@@ -0,0 +1,82 @@
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+
+from config import EXAM_TOKEN_SECRET, EXAM_TOKEN_TTL
+
+if EXAM_TOKEN_SECRET:
+    _SECRET = EXAM_TOKEN_SECRET.encode("utf-8")
+else:
+    print("[WARN] EXAM_TOKEN_SECRET not set, using a per-process secret")
+    _SECRET = secrets.token_bytes(32)
+
+
+class InvalidExamToken(ValueError):
+    pass
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(_SECRET, payload.encode("utf-8"), hashlib.sha256).digest())
+
+
+def issue_token(question_ids: list[int], level: str, bank_digest: str) -> str:
+    """
+    Encodes the exam's question ids, level and the digest of the bank the
+    ids point into as a compact signed token.
+    """
+    body = json.dumps(
+        {"q": question_ids, "l": level, "b": bank_digest, "t": int(time.time())},
+        separators=(",", ":"),
+    )
+    payload = _b64encode(body.encode("utf-8"))
+    return f"{payload}.{_sign(payload)}"
+
+
+def read_token(token: str, bank_size: int, bank_digest: str) -> tuple[list[int], str]:
+    """
+    Verifies a token and returns (question_ids, level).
+    Every failure (forged, expired, malformed, issued for another build of
+    the bank, or ids outside it) raises InvalidExamToken.
+    """
+    try:
+        payload, signature = token.split(".")
+    except ValueError:
+        raise InvalidExamToken("Malformed exam token")
+
+    # Compare bytes: compare_digest rejects non-ASCII str with TypeError
+    if not hmac.compare_digest(signature.encode("utf-8"), _sign(payload).encode("ascii")):
+        raise InvalidExamToken("Invalid exam token signature")
+
+    try:
+        body = json.loads(_b64decode(payload))
+        ids, level, digest, issued = body["q"], body["l"], body["b"], body["t"]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidExamToken("Malformed exam token")
+
+    if (
+        not isinstance(ids, list)
+        or not all(type(i) is int and 0 <= i < bank_size for i in ids)
+        or not isinstance(level, str)
+        or not isinstance(issued, int)
+    ):
+        raise InvalidExamToken("Malformed exam token")
+
+    if digest != bank_digest:
+        # Ids are bank positions: a rebuilt bank would grade other questions
+        raise InvalidExamToken("Exam token is from an older question bank")
+
+    if time.time() - issued > EXAM_TOKEN_TTL:
+        raise InvalidExamToken("Exam token expired")
+
+    return ids, level
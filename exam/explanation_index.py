@@ -0,0 +1,75 @@
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+
+from config import SQLITE_MMAP_SIZE
+
+INDEX_FILE = Path(__file__).resolve().parent.parent / "data" / "mcqs" / "boe_explanations.sqlite3"
+
+_conn = None
+_lock = threading.Lock()
+
+
+def hash_question(q: str) -> str:
+    # Same digest as helpers.generate_mcqs_big.hash_question
+    return hashlib.sha256(q.encode("utf-8")).hexdigest()
+
+
+def _connection():
+    """
+    Lazily open the prebuilt index read-only.
+    Returns None when the index has not been built.
+    """
+    global _conn
+    if _conn is None and INDEX_FILE.exists():
+        with _lock:
+            if _conn is None:
+                _conn = sqlite3.connect(
+                    f"file:{INDEX_FILE}?mode=ro",
+                    uri=True,
+                    check_same_thread=False,
+                )
+                _conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    return _conn
+
+
+def lookup_explanations(questions: list[str]) -> dict[str, str]:
+    """
+    Returns {question_text: explanation} for every question present in the index.
+    Questions missing from the index are simply absent from the result.
+    """
+    conn = _connection()
+    if conn is None or not questions:
+        return {}
+
+    by_hash = {hash_question(q): q for q in questions}
+    placeholders = ",".join("?" * len(by_hash))
+    with _lock:
+        rows = conn.execute(
+            f"SELECT qhash, explanation FROM explanations WHERE qhash IN ({placeholders})",
+            list(by_hash),
+        ).fetchall()
+    return {by_hash[h]: explanation for h, explanation in rows}
+
+
+def write_index(entries, path: Path = INDEX_FILE):
+    """
+    Writes (question_text, explanation) pairs to a fresh index file.
+    """
+    tmp = path.with_suffix(".tmp")
+    tmp.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(tmp)
+    conn.execute(
+        "CREATE TABLE explanations (qhash TEXT PRIMARY KEY, explanation TEXT NOT NULL)"
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO explanations VALUES (?, ?)",
+        ((hash_question(q), explanation) for q, explanation in entries),
+    )
+    conn.commit()
+    conn.close()
+
+    # Atomic swap so a running server never sees a half-written index
+    tmp.replace(path)
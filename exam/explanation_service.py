@@ -0,0 +1,129 @@
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+
+from clients.llm_client import llm
+from config import WORKER_LLM_CONCURRENCY
+from exam.boe_retriever import aget_boe_explanations
+from exam.exam_engine import build_retrieval_text
+from exam.explanation_index import hash_question, lookup_explanations
+from exam.single_flight import AsyncSingleFlight
+
+CACHE_FILE = Path(__file__).resolve().parent.parent / "data" / "mcqs" / "llm_explanations.sqlite3"
+
+FALLBACK_EXPLANATION = (
+    "According to traffic regulations, the selected answer does not comply "
+    "with the correct rule."
+)
+
+PROMPT = """
+You are a Spanish driving theory instructor.
+
+Using ONLY the legal reference below, explain why the user's answer is wrong
+and what the correct rule is.
+
+Legal reference (BOE):
+{boe_context}
+
+Question:
+{question_text}
+
+User's answer:
+{user_answer}
+
+Correct answer:
+{correct_answer}
+
+Rules:
+- Write 3 to 5 short sentences
+- Do NOT quote legal text verbatim
+- Do NOT mention article numbers
+- Do NOT include administrative or procedural law
+- Explain in clear, exam-oriented language
+"""
+
+
+class ExplanationService:
+    """
+    LLM explanations for wrong answers.
+    - persistent cache keyed by (question text hash, user answer), so
+      rebuilding or deduplicating the bank never remaps cached entries
+    - semaphore capping in-flight LLM calls at this worker's share of
+      LLM_MAX_CONCURRENCY
+    - identical concurrent misses share one generation
+    """
+
+    def __init__(self, cache_path: Path = CACHE_FILE, max_concurrency: int = WORKER_LLM_CONCURRENCY):
+        # Every worker writes this file: wait on locks instead of failing,
+        # WAL lets readers proceed during another worker's write
+        self._db = sqlite3.connect(cache_path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS explanations ("
+            "question_hash TEXT, user_answer TEXT, explanation TEXT NOT NULL, "
+            "PRIMARY KEY (question_hash, user_answer))"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()  # the connection is used from executor threads
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._flights = AsyncSingleFlight()
+
+    def _cached(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT explanation FROM explanations WHERE question_hash = ? AND user_answer = ?",
+                key,
+            ).fetchone()
+        return row[0] if row else None
+
+    def _store(self, key, explanation: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO explanations VALUES (?, ?, ?)",
+                (*key, explanation),
+            )
+            self._db.commit()
+
+    async def _generate(self, q: dict, user_answer: str) -> str:
+        indexed = await asyncio.to_thread(lookup_explanations, [q.get("question", "")])
+        boe_context = indexed.get(q.get("question"))
+        if boe_context is None:
+            boe_context = (await aget_boe_explanations([build_retrieval_text(q)]))[0]
+
+        if not boe_context:
+            return FALLBACK_EXPLANATION
+
+        prompt = PROMPT.format(
+            boe_context=boe_context,
+            question_text=q.get("question"),
+            user_answer=user_answer,
+            correct_answer=q.get("correct_answer"),
+        )
+
+        async with self._semaphore:
+            response = await llm.achat([{"role": "user", "content": prompt}])
+
+        return response.choices[0].message.content.strip()
+
+    async def _generate_and_store(self, key, q: dict, user_answer: str) -> str:
+        explanation = await self._generate(q, user_answer)
+        if explanation != FALLBACK_EXPLANATION:
+            await asyncio.to_thread(self._store, key, explanation)
+        return explanation
+
+    async def explain(self, q: dict, user_answer: str) -> str:
+        key = (hash_question(q.get("question", "")), user_answer)
+
+        # SQLite reads and commits stay off the event loop
+        explanation = await asyncio.to_thread(self._cached, key)
+        if explanation is not None:
+            return explanation
+
+        # Coalesce: join a generation already running for the same key.
+        # A disconnecting caller does not cancel the generation others wait on
+        return await self._flights.do(key, lambda: self._generate_and_store(key, q, user_answer))
+
+
+# -------- Global singleton --------
+explanations = ExplanationService()
@@ -0,0 +1,97 @@
+import re
+
+
+class NoiseFilter:
+    """
+    Keyword + pattern + digit-ratio + minimum-length noise check.
+
+    Keywords are matched as literals on the lowercased text and structural
+    patterns through one precompiled regex; the digit ratio uses str.count
+    instead of a per-character loop.
+
+    Keywords stay out of the regex: `in` is a fast C substring search,
+    while an alternation makes sre try every branch at every offset.
+    """
+
+    def __init__(self, keywords, patterns=(), max_digit_ratio=None, min_length=0):
+        self._keywords = tuple(k.lower() for k in keywords)
+        self._regex = re.compile("|".join(patterns)) if patterns else None
+        self._max_digit_ratio = max_digit_ratio
+        self._min_length = min_length
+
+    def _cheap_flag(self, text: str) -> bool:
+        if len(text) < self._min_length:
+            return True
+        if self._max_digit_ratio is None:
+            return False
+        # str.count runs in C; far cheaper than a per-character isdigit loop
+        digits = sum(text.count(d) for d in "0123456789")
+        return digits / max(len(text), 1) > self._max_digit_ratio
+
+    def is_noise(self, text: str) -> bool:
+        if self._cheap_flag(text):
+            return True
+        t = text.lower()
+        if any(k in t for k in self._keywords):
+            return True
+        return self._regex is not None and self._regex.search(t) is not None
+
+    def flags(self, texts: list[str]) -> list[bool]:
+        # Per-text on purpose: one regex over the joined batch was slower
+        return [self.is_noise(t) for t in texts]
+
+
+# Retrieval / ingestion filter for BOE legal text
+BOE_NOISE = NoiseFilter(
+    keywords=[
+        # Hard noise keywords (pure metadata / admin)
+        "isbn",
+        "nipo",
+        "depósito legal",
+        "catálogo de publicaciones",
+        "sumario",
+        "índice",
+        "boletín oficial del estado",
+        "agencia estatal",
+        "www.boe.es",
+        "avenida de",
+        "280",
+        "resolución de",
+        "dirección general de tráfico",
+        "medidas especiales de regulación",
+        "punto de acceso nacional",
+    ],
+    patterns=[
+        # Index / TOC dot leaders with page numbers
+        r"\.{5,}\s*\d+",
+        # Administrative annexes / registries (NOT driving rules)
+        r"\b(?:anexo|registro|consorcio)\b",
+    ],
+    # Big numeric tables (compensation charts, annexes)
+    max_digit_ratio=0.45,
+    # Too short to be meaningful
+    min_length=120,
+)
+
+# Stricter chunk filter used by the BOE article ingestion in __helpers
+INGEST_NOISE = NoiseFilter(
+    keywords=[
+        "isbn", "nipo", "depósito legal", "sumario", "índice",
+        "boletín oficial", "agencia estatal", "www.boe.es",
+        "anexo", "tabla", "indemnización", "euros",
+    ],
+    max_digit_ratio=0.30,
+)
+
+# Front-matter markers in English PDFs
+PDF_NOISE = NoiseFilter(
+    keywords=[
+        "thank you for downloading",
+        "disclaimer",
+        "introduction",
+        "email",
+        "www.",
+        "http",
+        "copyright",
+    ],
+)
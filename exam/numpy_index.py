@@ -0,0 +1,220 @@
+import json
+import shutil
+import threading
+
+import numpy as np
+
+from clients.chroma_client import VECTORSTORE_DIR
+from exam.bm25_index import _matches
+
+# Exported beside the Chroma store; read-only once written
+NUMPY_INDEX_DIR = VECTORSTORE_DIR.parent / "numpy"
+
+QUERY_BLOCK = 65536  # matrix rows scored per matmul
+
+
+def _write_blob(directory, name: str, values: list[str]):
+    """
+    Strings as one UTF-8 blob plus an int64 offsets array, both mmap-able.
+    """
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    (directory / f"{name}.bin").write_bytes(b"".join(encoded))
+    np.save(directory / f"{name}_offsets.npy", offsets)
+
+
+def export_numpy_index(collection, directory=NUMPY_INDEX_DIR, dtype: str = "float32",
+                       page_size: int = 5000) -> int:
+    """
+    Exports every chunk of the collection to:
+      embeddings.npy          (n, dim) L2-normalised float32, or int8
+      scales.npy              per-row dequantisation scale (int8 only)
+      ids / documents / metadatas .bin + _offsets.npy
+    Files are written to a temporary directory and swapped in.
+    """
+    if dtype not in ("float32", "int8"):
+        raise ValueError(f"Unsupported dtype: {dtype}")
+
+    tmp = directory.with_name(directory.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    ids, documents, metadatas, vectors = [], [], [], []
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["documents", "metadatas", "embeddings"], limit=page_size, offset=offset
+        )
+        if not len(page["ids"]):
+            break
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(json.dumps(m or {}, ensure_ascii=False) for m in page["metadatas"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+
+    matrix = np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.maximum(norms, 1e-12)
+
+    if dtype == "int8":
+        # Symmetric per-row quantisation: row ~= int8 row * scale
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales = np.maximum(scales, 1e-12).astype(np.float32)
+        quantized = np.rint(matrix / scales[:, None]).astype(np.int8)
+        np.save(tmp / "embeddings.npy", quantized)
+        np.save(tmp / "scales.npy", scales)
+    else:
+        np.save(tmp / "embeddings.npy", matrix)
+
+    _write_blob(tmp, "ids", ids)
+    _write_blob(tmp, "documents", documents)
+    _write_blob(tmp, "metadatas", metadatas)
+
+    # Swap directories; processes holding the old maps keep their pages
+    old = directory.with_name(directory.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if directory.exists():
+        directory.rename(old)
+    tmp.rename(directory)
+    shutil.rmtree(old, ignore_errors=True)
+
+    print(f"[NUMPY] Exported {len(ids)} chunks ({dtype}) -> {directory}")
+    return len(ids)
+
+
+class _Blob:
+    def __init__(self, directory, name: str):
+        self._offsets = np.load(directory / f"{name}_offsets.npy", mmap_mode="r")
+        self._data = np.memmap(directory / f"{name}.bin", dtype=np.uint8, mode="r") \
+            if self._offsets[-1] else np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return self._data[start:end].tobytes().decode("utf-8")
+
+
+class NumpyIndex:
+    """
+    Read-only vector index over an exported collection.
+
+    Matrices and string blobs are memory-mapped, so startup does no work
+    and worker processes share the same page cache. Exposes the subset of
+    the Chroma collection interface the retrievers use: query, get, count.
+    Distances are cosine distances (1 - similarity).
+    """
+
+    def __init__(self, embedding_function, directory=NUMPY_INDEX_DIR):
+        self.embedding_function = embedding_function
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._masks = {}
+        self._metadata_cache = None
+
+    def _load(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._embeddings = np.load(self.directory / "embeddings.npy", mmap_mode="r")
+            scales = self.directory / "scales.npy"
+            self._scales = np.load(scales, mmap_mode="r") if scales.exists() else None
+            self._ids = _Blob(self.directory, "ids")
+            self._documents = _Blob(self.directory, "documents")
+            self._metadatas = _Blob(self.directory, "metadatas")
+            self._loaded = True
+
+    def count(self) -> int:
+        self._load()
+        return len(self._ids)
+
+    def _metadata(self, i: int) -> dict:
+        return json.loads(self._metadatas[i])
+
+    def _mask(self, where):
+        """
+        Boolean row mask for a where clause, computed once per clause.
+        """
+        if not where:
+            return None
+        key = json.dumps(where, sort_keys=True)
+        mask = self._masks.get(key)
+        if mask is None:
+            if self._metadata_cache is None:
+                self._metadata_cache = [self._metadata(i) for i in range(self.count())]
+            mask = np.fromiter(
+                (_matches(m, where) for m in self._metadata_cache),
+                dtype=bool, count=len(self._metadata_cache),
+            )
+            self._masks[key] = mask
+        return mask
+
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        # One matmul per block of rows; int8 blocks are widened per block only
+        n = self._embeddings.shape[0]
+        scores = np.empty((queries.shape[0], n), dtype=np.float32)
+        for start in range(0, n, QUERY_BLOCK):
+            block = np.asarray(self._embeddings[start:start + QUERY_BLOCK], dtype=np.float32)
+            scores[:, start:start + QUERY_BLOCK] = queries @ block.T
+        if self._scales is not None:
+            scores *= self._scales
+        return scores
+
+    def _rows(self, rows, include) -> dict:
+        result = {"ids": [self._ids[i] for i in rows]}
+        if "documents" in include:
+            result["documents"] = [self._documents[i] for i in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self._metadata(i) for i in rows]
+        return result
+
+    def query(self, query_texts=None, query_embeddings=None, n_results: int = 10,
+              where=None, include=("documents", "metadatas", "distances")) -> dict:
+        self._load()
+        if query_embeddings is None:
+            query_embeddings = self.embedding_function(list(query_texts))
+
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        scores = self._scores(queries)
+        mask = self._mask(where)
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+
+        available = int(mask.sum()) if mask is not None else scores.shape[1]
+        k = min(n_results, available)
+
+        out = {"ids": [], "distances": []}
+        for key in ("documents", "metadatas"):
+            if key in include:
+                out[key] = []
+
+        for row in scores:
+            if k == 0:
+                top = np.zeros(0, dtype=np.int64)
+            else:
+                top = np.argpartition(-row, k - 1)[:k]
+                top = top[np.argsort(-row[top])]
+            for key, values in self._rows(top, include).items():
+                out[key].append(values)
+            out["distances"].append((1.0 - row[top]).tolist())
+        return out
+
+    def get(self, ids=None, where=None, limit: int = None, offset: int = 0,
+            include=("documents", "metadatas")) -> dict:
+        self._load()
+        if ids is not None:
+            wanted = set(ids)
+            rows = [i for i in range(self.count()) if self._ids[i] in wanted]
+        else:
+            mask = self._mask(where)
+            rows = np.flatnonzero(mask) if mask is not None else np.arange(self.count())
+        end = None if limit is None else offset + limit
+        return self._rows(list(rows[offset:end]), include)
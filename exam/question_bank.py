@@ -0,0 +1,187 @@
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+
+from config import SQLITE_MMAP_SIZE
+
+MCQ_DIR = Path(__file__).resolve().parent.parent / "data" / "mcqs"
+MCQ_FILE = MCQ_DIR / "eng_big_mcqs.json"
+MCQ_DB_FILE = MCQ_DIR / "eng_big_mcqs.sqlite3"
+
+DIFFICULTIES = ("easy", "medium", "hard")
+
+
+def _payload(q: dict) -> str:
+    return json.dumps(q, ensure_ascii=False, separators=(",", ":"))
+
+
+def bank_digest(payloads) -> str:
+    """
+    Short digest of the bank contents in id order; changes whenever a
+    rebuild or dedupe could renumber questions.
+    """
+    h = hashlib.sha256()
+    for payload in payloads:
+        h.update(payload.encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()[:16]
+
+
+class QuestionBank:
+    """
+    Loads the MCQ bank once and keeps difficulty / topic indexes as compact
+    id arrays. Question ids are positions in the source JSON array.
+
+    When the SQLite build of the bank exists (helpers/build_question_bank.py)
+    only the index columns are read at startup and question dicts are
+    materialized on demand, so sampling an exam touches only its questions.
+    Otherwise the JSON file is parsed once and kept in memory.
+    """
+
+    def __init__(self, json_path: Path = MCQ_FILE, db_path: Path = MCQ_DB_FILE):
+        self._json_path = json_path
+        self._db_path = db_path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._conn = None
+        self._questions = None  # only used for the JSON fallback
+
+        self.size = 0
+        self.digest = ""
+        self.by_difficulty = {d: array("I") for d in DIFFICULTIES}
+        self.by_topic = {}
+
+    def _index(self, qid: int, difficulty, topic):
+        self.by_difficulty.setdefault(difficulty or "medium", array("I")).append(qid)
+        self.by_topic.setdefault(topic or "unknown", array("I")).append(qid)
+
+    def load(self):
+        if self._loaded:
+            return self
+        with self._lock:
+            if self._loaded:
+                return self
+
+            if self._db_path.exists():
+                self._conn = sqlite3.connect(
+                    f"file:{self._db_path}?mode=ro",
+                    uri=True,
+                    check_same_thread=False,
+                )
+                # Read through mmap: workers share the OS page cache
+                # instead of each filling a private SQLite cache
+                self._conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+                rows = self._conn.execute(
+                    "SELECT id, difficulty, topic FROM questions ORDER BY id"
+                )
+                for qid, difficulty, topic in rows:
+                    self._index(qid, difficulty, topic)
+                    self.size += 1
+                self.digest = self._db_digest()
+            else:
+                self._questions = json.loads(self._json_path.read_text(encoding="utf-8"))
+                for qid, q in enumerate(self._questions):
+                    self._index(qid, q.get("difficulty"), q.get("topic_name"))
+                self.size = len(self._questions)
+                self.digest = bank_digest(_payload(q) for q in self._questions)
+
+            self._loaded = True
+        return self
+
+    def _db_digest(self) -> str:
+        row = self._conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'meta'"
+        ).fetchone()
+        if row is not None:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'digest'").fetchone()
+        if row is not None:
+            return row[0]
+        # Index built before the digest was stored: hash the payloads once
+        rows = self._conn.execute("SELECT payload FROM questions ORDER BY id")
+        return bank_digest(payload for payload, in rows)
+
+    def get(self, ids) -> list[dict]:
+        """
+        Materializes question dicts for ids, preserving order.
+        """
+        self.load()
+        ids = list(ids)
+
+        if self._questions is not None:
+            return [self._questions[i] for i in ids]
+
+        payloads = {}
+        unique = list(set(ids))
+        # Stay well under SQLite's bound-parameter limit
+        for i in range(0, len(unique), 500):
+            chunk = unique[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, payload FROM questions WHERE id IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+            payloads.update((qid, json.loads(payload)) for qid, payload in rows)
+        return [payloads[i] for i in ids]
+
+    def sample_ids(self, weights: dict, n: int) -> list[int]:
+        """
+        Samples n question ids according to per-difficulty weights.
+        """
+        self.load()
+
+        ids = []
+        for diff, w in weights.items():
+            bucket = self.by_difficulty.get(diff, ())
+            count = int(n * w)
+            ids.extend(random.sample(bucket, min(count, len(bucket))))
+
+        while len(ids) < n:
+            ids.append(random.randrange(self.size))
+
+        random.shuffle(ids)
+        return ids[:n]
+
+
+def build_bank_db(json_path: Path = MCQ_FILE, db_path: Path = MCQ_DB_FILE):
+    """
+    Converts the JSON bank into the indexed SQLite format read by QuestionBank.
+    """
+    mcqs = json.loads(json_path.read_text(encoding="utf-8"))
+
+    tmp = db_path.with_suffix(".tmp")
+    tmp.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(tmp)
+    conn.execute(
+        "CREATE TABLE questions ("
+        "id INTEGER PRIMARY KEY, difficulty TEXT, topic TEXT, payload TEXT NOT NULL)"
+    )
+    payloads = [_payload(q) for q in mcqs]
+    conn.executemany(
+        "INSERT INTO questions VALUES (?, ?, ?, ?)",
+        (
+            (
+                qid,
+                q.get("difficulty") or "medium",
+                q.get("topic_name") or "unknown",
+                payload,
+            )
+            for qid, (q, payload) in enumerate(zip(mcqs, payloads))
+        ),
+    )
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    conn.execute("INSERT INTO meta VALUES ('digest', ?)", (bank_digest(payloads),))
+    conn.commit()
+    conn.close()
+
+    tmp.replace(db_path)
+    return len(mcqs)
+
+
+# -------- Global singleton --------
+bank = QuestionBank()
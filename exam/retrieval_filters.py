@@ -0,0 +1,71 @@
+import json
+import math
+import threading
+
+from config import RETRIEVAL_EMA_ALPHA
+
+
+def build_where(source: str = None, lang: str = None, topic: str = None,
+                article: int = None, noise: bool = None):
+    """
+    Chroma where clause from structured filters; None when nothing is set.
+    Several filters are combined with $and, as Chroma requires.
+    """
+    clauses = [
+        {key: value}
+        for key, value in (
+            ("source", source),
+            ("lang", lang),
+            ("topic", topic),
+            ("article", article),
+            ("noise", noise),
+        )
+        if value is not None
+    ]
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
+
+
+class AdaptiveFetch:
+    """
+    Sizes n_results from the observed share of hits that survive the
+    Python-side snippet filter, tracked per where clause as an EMA.
+
+    A fully pre-filtered query converges to `needed + 1` candidates, while
+    an unfiltered one keeps over-fetching up to `max_results`.
+    """
+
+    def __init__(self, alpha: float = RETRIEVAL_EMA_ALPHA):
+        self.alpha = alpha
+        self._rates = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(where) -> str:
+        return json.dumps(where, sort_keys=True)
+
+    def n_results(self, where, needed: int, max_results: int) -> int:
+        with self._lock:
+            rate = self._rates.get(self._key(where))
+        if rate is None:
+            # Nothing observed yet for this filter: fetch the full budget once
+            return max_results
+        # One spare candidate absorbs the variance of a single query
+        wanted = math.ceil(needed / max(rate, 0.05)) + 1
+        return max(needed, min(wanted, max_results))
+
+    def observe(self, where, fetched: int, passed: int):
+        if fetched <= 0:
+            return
+        key = self._key(where)
+        sample = passed / fetched
+        with self._lock:
+            rate = self._rates.get(key)
+            self._rates[key] = sample if rate is None else rate + self.alpha * (sample - rate)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {key: round(rate, 3) for key, rate in self._rates.items()}
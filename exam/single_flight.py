@@ -0,0 +1,136 @@
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls across threads: the first caller
+    for a key runs the work, later callers for the same key wait for it
+    and receive the same result (or exception).
+
+    stats: calls (keys requested), executed (keys actually fetched),
+    coalesced (keys served by another caller's in-flight fetch).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.stats = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    def do_batch(self, keys: list, fetch_many) -> dict:
+        """
+        fetch_many(own_keys) -> {key: result} runs once for the keys no
+        other caller is fetching; the rest are awaited.
+        """
+        own, waiting = {}, {}
+        with self._lock:
+            for key in keys:
+                self.stats["calls"] += 1
+                call = self._inflight.get(key)
+                if call is None:
+                    call = own[key] = self._inflight[key] = _Call()
+                else:
+                    waiting[key] = call
+                    self.stats["coalesced"] += 1
+            self.stats["executed"] += len(own)
+
+        if own:
+            try:
+                results = fetch_many(list(own))
+                for key, call in own.items():
+                    call.result = results[key]
+            except BaseException as e:
+                for call in own.values():
+                    call.error = e
+                raise
+            finally:
+                with self._lock:
+                    for key in own:
+                        del self._inflight[key]
+                for call in own.values():
+                    call.done.set()
+
+        out = {key: call.result for key, call in own.items()}
+        for key, call in waiting.items():
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            out[key] = call.result
+        return out
+
+    def do(self, key, fn):
+        return self.do_batch([key], lambda keys: {key: fn()})[key]
+
+
+def _consume(future):
+    if not future.cancelled():
+        future.exception()
+
+
+class AsyncSingleFlight:
+    """
+    asyncio variant of SingleFlight. The shared fetch runs as its own task,
+    so a caller that disconnects never cancels the work others await.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._tasks = set()
+        self.stats = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    async def _run(self, own: dict, fetch_many):
+        try:
+            results = await fetch_many(list(own))
+            for key, future in own.items():
+                future.set_result(results[key])
+        except BaseException as e:
+            for future in own.values():
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for key in own:
+                del self._inflight[key]
+
+    async def do_batch(self, keys: list, fetch_many) -> dict:
+        """
+        `fetch_many(own_keys)` is a coroutine function returning {key: result}.
+        """
+        loop = asyncio.get_running_loop()
+        futures, own = {}, {}
+        for key in keys:
+            self.stats["calls"] += 1
+            future = self._inflight.get(key)
+            if future is None:
+                future = own[key] = self._inflight[key] = loop.create_future()
+            else:
+                self.stats["coalesced"] += 1
+            futures[key] = future
+        self.stats["executed"] += len(own)
+
+        if own:
+            task = asyncio.ensure_future(self._run(own, fetch_many))
+            # Keep a reference until done; the loop only holds weak ones
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        waiting = asyncio.gather(*futures.values())
+        # If this caller disconnects, nobody awaits `waiting` any more:
+        # retrieve its outcome so a failed fetch is not reported as unhandled
+        waiting.add_done_callback(_consume)
+        results = await asyncio.shield(waiting)
+        return dict(zip(futures, results))
+
+    async def do(self, key, coro_fn):
+        async def fetch(keys):
+            return {key: await coro_fn()}
+
+        return (await self.do_batch([key], fetch))[key]
@@ -0,0 +1,22 @@
+from pathlib import Path
+import sys
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from clients.chroma_client import chroma
+from exam.bm25_index import BM25_FILE, build_bm25_index
+
+
+def main():
+    collection = chroma.get_collection("pdf_docs")
+    print(f"[INFO] Building BM25 index for {collection.count()} chunks")
+
+    count = build_bm25_index(collection)
+
+    print(f"[DONE] Indexed {count} chunks")
+    print("Saved to:", BM25_FILE)
+
+
+if __name__ == "__main__":
+    main()
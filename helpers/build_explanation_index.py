@@ -0,0 +1,37 @@
+from pathlib import Path
+import sys
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from exam.boe_retriever import get_boe_explanations
+from exam.exam_engine import build_retrieval_text
+from exam.question_bank import bank
+from exam.explanation_index import INDEX_FILE, write_index
+
+# ------------------ Config ------------------
+QUERY_BATCH = 64  # questions per collection.query call
+
+
+def main():
+    mcqs = bank.get(range(bank.load().size))
+    print(f"[INFO] Building BOE explanation index for {len(mcqs)} questions")
+
+    entries = []
+    for i in range(0, len(mcqs), QUERY_BATCH):
+        batch = [q for q in mcqs[i:i + QUERY_BATCH] if q.get("question")]
+        explanations = get_boe_explanations([build_retrieval_text(q) for q in batch])
+        entries.extend(
+            (q["question"], explanation)
+            for q, explanation in zip(batch, explanations)
+        )
+        print(f"[PROGRESS] {min(i + QUERY_BATCH, len(mcqs))}/{len(mcqs)}")
+
+    write_index(entries)
+
+    print(f"[DONE] Indexed {len(entries)} explanations")
+    print("Saved to:", INDEX_FILE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+from pathlib import Path
+import sys
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from exam.question_bank import MCQ_FILE, MCQ_DB_FILE, build_bank_db
+
+
+def main():
+    count = build_bank_db(MCQ_FILE, MCQ_DB_FILE)
+    print(f"[DONE] Indexed {count} MCQs")
+    print("Saved to:", MCQ_DB_FILE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+def chunk_id(text: str) -> str:
+    """
+    Stable id for a source chunk, independent of its position.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _read_lines(path: Path):
+    if not path.exists():
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            # A crash can leave a truncated last line; it carries no newline
+            if line.endswith("\n") and line.strip():
+                yield line
+
+
+def _drop_torn_tail(path: Path):
+    """
+    Cuts a partially written last line so new appends start on a clean line.
+    """
+    if not path.exists():
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+class JsonlCheckpoint:
+    """
+    Append-only MCQ store with a resume cursor.
+
+    <name>.jsonl        one accepted question per line
+    <name>.cursor       one finished chunk id per line
+
+    Writes are flushed and fsync'd every `fsync_every` records, so a crash
+    loses at most one batch and never corrupts what is already on disk.
+    Finished chunk ids are held back and written to the cursor only after
+    the questions file has been fsync'd, so a chunk is never recorded as
+    done while its questions could still be lost.
+    """
+
+    def __init__(self, jsonl_path: Path, fsync_every: int = 20):
+        self.jsonl_path = jsonl_path
+        self.cursor_path = jsonl_path.with_suffix(".cursor")
+        self.fsync_every = fsync_every
+        self._pending = 0
+        self._done_chunks = []
+        self._records = None
+        self._cursor = None
+
+    def load(self, seed_from: Path = None):
+        """
+        Returns (questions, done_chunk_ids) from a previous run.
+        When no JSONL exists yet, it is seeded from an existing JSON array bank.
+        """
+        if not self.jsonl_path.exists() and seed_from is not None and seed_from.exists():
+            with open(seed_from, "r", encoding="utf-8") as f:
+                seed = json.load(f)
+            with open(self.jsonl_path, "w", encoding="utf-8") as f:
+                for q in seed:
+                    f.write(json.dumps(q, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+        _drop_torn_tail(self.jsonl_path)
+        _drop_torn_tail(self.cursor_path)
+
+        questions = [json.loads(line) for line in _read_lines(self.jsonl_path)]
+        done = {line.strip() for line in _read_lines(self.cursor_path)}
+
+        self._records = open(self.jsonl_path, "a", encoding="utf-8")
+        self._cursor = open(self.cursor_path, "a", encoding="utf-8")
+        return questions, done
+
+    def append(self, question: dict):
+        self._records.write(json.dumps(question, ensure_ascii=False) + "\n")
+        self._tick()
+
+    def mark_done(self, chunk: str):
+        # Recorded at the next sync(), after the questions are durable
+        self._done_chunks.append(chunk)
+        self._tick()
+
+    def _tick(self):
+        self._pending += 1
+        if self._pending >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        self._records.flush()
+        os.fsync(self._records.fileno())
+        if self._done_chunks:
+            self._cursor.writelines(chunk + "\n" for chunk in self._done_chunks)
+            self._cursor.flush()
+            os.fsync(self._cursor.fileno())
+            self._done_chunks.clear()
+        self._pending = 0
+
+    def close(self):
+        self.sync()
+        self._records.close()
+        self._cursor.close()
+
+    def compact(self, dst: Path):
+        """
+        Writes the final JSON array bank atomically.
+        """
+        questions = [json.loads(line) for line in _read_lines(self.jsonl_path)]
+        tmp = dst.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(questions, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        tmp.replace(dst)
+        return len(questions)
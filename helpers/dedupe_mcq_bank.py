@@ -0,0 +1,48 @@
+from pathlib import Path
+import json
+import sys
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from config import NEAR_DUP_THRESHOLD
+from helpers.near_duplicates import embed_texts, cluster_near_duplicates, load_vectors
+
+# ------------------ Config ------------------
+MCQ_FILE = BASE_DIR / "data" / "mcqs" / "eng_big_mcqs.json"
+VECTORS_FILE = MCQ_FILE.with_suffix(".vectors.npz")
+OUTPUT_FILE = MCQ_FILE.with_suffix(".dedup.json")
+REPORT_FILE = MCQ_FILE.with_suffix(".clusters.json")
+
+
+def main():
+    mcqs = json.loads(MCQ_FILE.read_text(encoding="utf-8"))
+    questions = [q.get("question") or "" for q in mcqs]
+    print(f"[INFO] Clustering {len(mcqs)} questions at threshold {NEAR_DUP_THRESHOLD}")
+
+    # Reuse the generators' vectors when they cover the whole bank
+    vectors = load_vectors(VECTORS_FILE, questions)
+    if vectors is None or len(vectors) != len(mcqs):
+        vectors = embed_texts(questions)
+
+    clusters = cluster_near_duplicates(vectors)
+
+    # Keep the earliest question of each cluster
+    dropped = {i for cluster in clusters for i in cluster[1:]}
+    kept = [q for i, q in enumerate(mcqs) if i not in dropped]
+
+    REPORT_FILE.write_text(json.dumps(
+        [[questions[i] for i in cluster] for cluster in clusters],
+        ensure_ascii=False, indent=2,
+    ), encoding="utf-8")
+    OUTPUT_FILE.write_text(json.dumps(kept, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"[DONE] {len(clusters)} clusters, {len(dropped)} near-duplicates removed")
+    print("Clusters:", REPORT_FILE)
+    print("Deduplicated bank:", OUTPUT_FILE)
+    print("Replace the bank with it, then rerun build_question_bank.py "
+          "and build_explanation_index.py (question ids change)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+from pathlib import Path
+import sys
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from clients.chroma_client import chroma
+from config import NUMPY_INDEX_DTYPE
+from exam.numpy_index import NUMPY_INDEX_DIR, export_numpy_index
+
+
+def main():
+    collection = chroma.get_collection("pdf_docs")
+    print(f"[INFO] Exporting {collection.count()} chunks as {NUMPY_INDEX_DTYPE}")
+
+    count = export_numpy_index(collection, dtype=NUMPY_INDEX_DTYPE)
+
+    print(f"[DONE] Exported {count} chunks")
+    print("Saved to:", NUMPY_INDEX_DIR)
+    print("Serve it with RETRIEVAL_BACKEND=numpy")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,6 @@
 from pathlib import Path
-import json
+import asyncio
 import sys
-import time
 import hashlib
 
 # ------------------ Paths ------------------
@@ -10,12 +9,24 @@ sys.path.insert(0, str(BASE_DIR))
 
 from clients.chroma_client import chroma
 from clients.llm_client import llm
-from config import MCQS_PER_WINDOW
+from config import (
+    MCQS_PER_WINDOW,
+    MCQ_GEN_CONCURRENCY,
+    MCQ_GEN_QUEUE_SIZE,
+    MCQ_GEN_MAX_RETRIES,
+    MCQ_GEN_STREAMING,
+)
 from helpers.helper import normalize_mcqs_output
+from helpers.mcq_pipeline import run_pipeline
+from helpers.checkpoint import JsonlCheckpoint, chunk_id
+from helpers.near_duplicates import NearDuplicateIndex, save_vectors
+from helpers.mcq_parser import MCQ_RESPONSE_FORMAT, ParseYield, parse_mcq_output, astream_mcqs
 
 # ------------------ Config ------------------
 COLLECTION_NAME = "pdf_docs"
 OUTPUT_FILE = BASE_DIR / "data" / "mcqs" / "eng_big_mcqs.json"
+CHECKPOINT_FILE = OUTPUT_FILE.with_suffix(".jsonl")
+VECTORS_FILE = OUTPUT_FILE.with_suffix(".vectors.npz")
 
 OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
 
@@ -23,6 +34,7 @@ MAX_CONTEXT_CHUNKS = 5
 SLEEP_BETWEEN_CALLS = 1.5  # seconds (rate safety)
 
 collection = chroma.get_collection(COLLECTION_NAME)
+parse_yield = ParseYield()
 
 TOPIC_SEEDS = [
     "speed limits",
@@ -102,46 +114,37 @@ def retrieve_context(query: str, k: int = MAX_CONTEXT_CHUNKS) -> str:
     return (results["documents"][0])
 
 
-def safe_json_load(text: str, retries: int = 2):
-    for attempt in range(retries + 1):
-        try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            print(f"Failed to load JSON: {text}")
-            if attempt == retries:
-                continue
-            time.sleep(0.5)
-    return []
-
-def extract_list(parsed):
-    """
-    Unwraps common output shapes:
-    - {"questions":[...]} -> returns list
-    - list[...] -> returns list
-    - otherwise -> []
-    """
-    if isinstance(parsed, dict):
-        if "questions" in parsed and isinstance(parsed["questions"], list):
-            return parsed["questions"]
-        return []
-    if isinstance(parsed, list):
-        return parsed
-    return []
-
-
-def generate_mcqs(context_text: str, count: int):
+def build_messages(context_text: str, count: int):
     prompt = SYSTEM_PROMPT.format(
         n=count,
         context_text=context_text
     )
+    return [{"role": "user", "content": prompt}]
+
+
+def parse_mcqs(raw: str):
+    # Salvages complete questions from malformed / truncated output
+    return parse_mcq_output(raw, parse_yield)
 
-    messages = [{"role": "user", "content": prompt}]
-    response = llm.chat(messages)
+
+def generate_mcqs(context_text: str, count: int):
+    response = llm.chat(build_messages(context_text, count), response_format=MCQ_RESPONSE_FORMAT)
     raw = response.choices[0].message.content.strip()
     # print(f"{raw}\n======================")
-    parsed = safe_json_load(raw)
-    # print(f"parsed['question'] ================= \n{parsed['questions'][0]['question']}\n======================")
-    return extract_list(parsed)
+    return parse_mcqs(raw)
+
+
+async def agenerate_raw(context_text: str, count: int) -> str:
+    response = await llm.achat(build_messages(context_text, count), response_format=MCQ_RESPONSE_FORMAT)
+    return response.choices[0].message.content.strip()
+
+
+def astream_generate(context_text: str, count: int):
+    """
+    Questions as their closing brace arrives; decoding stops after `count`.
+    """
+    tokens = llm.astream(build_messages(context_text, count), response_format=MCQ_RESPONSE_FORMAT)
+    return astream_mcqs(tokens, limit=count, metric=parse_yield)
 
 
 def hash_question(q: str) -> str:
@@ -162,52 +165,76 @@ def main():
     chunk_texts = ''.join(chunk_texts).split(" \n") #splitting if paragraph is changed
     
     print(f"[INFO] Total chunks found: {len(chunk_texts)}")
-    large_bank = []
-    seen = set()
     # print(chunk_texts)
     # exit()
-    # Load existing bank if it exists
-    if OUTPUT_FILE.exists():
-        with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-            large_bank = json.load(f)
-            for q in large_bank:
-                seen.add(hash_question(q["question"]))
-    
+    # Resume from the append-only checkpoint (seeded from an existing bank)
+    checkpoint = JsonlCheckpoint(CHECKPOINT_FILE)
+    large_bank, done = checkpoint.load(seed_from=OUTPUT_FILE)
+    seen = {hash_question(q["question"]) for q in large_bank}
+    # Paraphrases slip past the exact hash; compare embeddings too
+    near_dups = NearDuplicateIndex()
+    near_dups.seed([q["question"] for q in large_bank], cache_path=VECTORS_FILE)
+    pending = [i for i, chunk in enumerate(chunk_texts) if chunk_id(chunk) not in done]
+    print(f"[INFO] Resuming: {len(chunk_texts) - len(pending)} chunks already done")
+
     # print(f"====>{chunk_texts[0]}<=====")
     # exit()
 
-    for i, chunk in enumerate(chunk_texts):
-        if i % 50 == 0:
-            print(f"[PROGRESS] Processing chunk {i}/{len(chunk_texts)}")
-
+    def retrieve(chunk):
         context = retrieve_context(chunk, 5)
-        if not context: 
+        if not context:
             print(f"  |  Skipping because the context is None")
-            print(f"[DEBUG]| [CONTEXT]: {context}")
-            continue
-        mcqs = generate_mcqs(context, 3)
-        # print(f"=================================================\nC:{''.join(context)}")
-        print(f"=================================================\nQ:{mcqs}")
+        return context
+
+    def sink(i, mcqs, done):
+        if mcqs:
+            print(f"=================================================\nQ:{mcqs}")
 
+        candidates = []
         for q in mcqs:
             # Check required fields
-            # q_hash = hash_question(q["question"])
             question_text = q.get("question")
             if not question_text:
                 continue
             q_hash = hash_question(question_text)
             if q_hash in seen:
                 continue
-            # if q_hash in seen:
-            #     continue
             seen.add(q_hash)
-            large_bank.append(q)
-
-        # Save periodically to avoid memory spikes
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-            json.dump(large_bank, f, ensure_ascii=False, indent=2)
-
-        time.sleep(0.5)
+            candidates.append(q)
+
+        accepted = near_dups.check([q["question"] for q in candidates])
+        for q, ok in zip(candidates, accepted):
+            if ok:
+                large_bank.append(q)
+                checkpoint.append(q)
+
+        if done:
+            if i % 50 == 0:
+                print(f"[PROGRESS] Processing chunk {i}/{len(chunk_texts)}")
+            checkpoint.mark_done(chunk_id(chunk_texts[i]))
+
+    # Items are chunk indexes so the sink can report progress
+    try:
+        stats = asyncio.run(run_pipeline(
+            pending,
+            retrieve=lambda i: retrieve(chunk_texts[i]),
+            generate=lambda context: agenerate_raw(context, 3),
+            parse=parse_mcqs,
+            sink=sink,
+            concurrency=MCQ_GEN_CONCURRENCY,
+            queue_size=MCQ_GEN_QUEUE_SIZE,
+            max_retries=MCQ_GEN_MAX_RETRIES,
+            stream=(lambda context: astream_generate(context, 3)) if MCQ_GEN_STREAMING else None,
+        ))
+    finally:
+        checkpoint.close()
+        save_vectors(VECTORS_FILE, near_dups.vectors, [q["question"] for q in large_bank])
+    print(f"[STATS] {stats}")
+    print(f"[DEDUP] {near_dups.stats}")
+    print(f"[PARSE] {parse_yield}")
+
+    # Compact the append-only log into the final JSON array bank
+    checkpoint.compact(OUTPUT_FILE)
 
     print(f"[DONE] Generated {len(large_bank)} MCQs")
     print("Saved to:", OUTPUT_FILE)
@@ -1,7 +1,5 @@
-from pypdf import PdfReader
 from pathlib import Path
 from langchain_text_splitters import TokenTextSplitter
-from collections import defaultdict
 import os
 import sys
 import time
@@ -10,7 +8,10 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
 from clients.chroma_client import chroma
-from config import BATCH_SIZE
+from helpers.ingestion import sync_document
+from helpers.pdf_extract import extract_page_texts
+from helpers.provenance import ProvenanceIndex
+from exam.bm25_index import build_bm25_index
 CHAPTER_REGEX = re.compile(
     r"(chapter\s+\d+|cap[ií]tulo\s+\d+)",
     re.IGNORECASE
@@ -20,6 +21,7 @@ CHAPTER_REGEX = re.compile(
 def build_text_with_metadata(pages):
     full_text = []
     page_map = []
+    offset = 0
 
     current_chapter = None
 
@@ -30,9 +32,10 @@ def build_text_with_metadata(pages):
         if match:
             current_chapter = match.group(0)
 
-        start_idx = sum(len(t) for t in full_text)
+        start_idx = offset
         full_text.append(text + "\n")
         end_idx = start_idx + len(text)
+        offset += len(text) + 1
 
         page_map.append({
             "start": start_idx,
@@ -46,19 +49,67 @@ def build_text_with_metadata(pages):
 
 # Step 1: Extract pages's text from PDF
 def extract_pages(pdf_path):
-    reader = PdfReader(pdf_path)
-    pages = []
-    for i, page in enumerate(reader.pages):
-        text = page.extract_text()
+    # Parallel extraction, cached per (PDF hash, page number)
+    for page_number, text in extract_page_texts(pdf_path):
         if text and text.strip():
-            print(f"Page {i + 1} extracted")
-            pages.append({
-                "page_number": i + 1,
+            yield {
+                "page_number": page_number,
                 "text": text.strip()
-            })
-    return pages
+            }
 
 # Step 2: Create chunks from text chunks
+def iter_chunks(pages, splitter, window_chars: int = 2000):
+    """
+    Streams pages in and yields chunks with exact provenance:
+    absolute start / end offsets in the page stream plus the pages and
+    chapters the chunk overlaps. Only one window of pages is held at a time.
+    """
+    window = []      # page texts of the current window
+    index = ProvenanceIndex()
+    window_start = 0
+    window_len = 0
+    current_chapter = None
+
+    def flush():
+        text = "".join(window)
+        search_from = 0
+        for chunk in splitter.split_text(text):
+            # Tokenizer round-trips can alter boundary chars; fall back to the cursor
+            local = text.find(chunk, search_from)
+            if local < 0:
+                local = search_from
+            start = window_start + local
+            # Overlap is well under half a chunk, so the next chunk starts past the midpoint
+            search_from = local + max(1, len(chunk) // 2)
+
+            yield {
+                "text": chunk,
+                "metadata": index.metadata_for(start, start + len(chunk)),
+            }
+
+    for page in pages:
+        match = CHAPTER_REGEX.search(page["text"])
+        if match:
+            current_chapter = match.group(0)
+
+        text = page["text"] + "\n"
+        start = window_start + window_len
+        index.add_page(start, start + len(text), page["page_number"], current_chapter, text)
+        window.append(text)
+        window_len += len(text)
+
+        # chunk when the window grows past the character guard
+        if window_len > window_chars:
+            yield from flush()
+            window_start += window_len
+            window, window_len = [], 0
+            index.drop_before(window_start)
+
+    # flush remainder
+    if "".join(window).strip():
+        yield from flush()
+
+
 def chunks_for_embeddings(PDF_PATH):
     # PDF_PATH = BASE_DIR / "files" / "pdf" / "SpanishTrafficLaw.pdf"
 
@@ -67,42 +118,7 @@ def chunks_for_embeddings(PDF_PATH):
         chunk_overlap=32
     )
 
-    chunks = []
-    buffer_text = ""
-    buffer_pages = []
-    pages = extract_pages(PDF_PATH)
-
-    for page in pages:
-        buffer_text += page["text"] + "\n"
-        buffer_pages.append(page["page_number"])
-
-        # chunk when buffer grows
-        if len(buffer_text) > 2000:  # character guard
-            sub_chunks = splitter.split_text(buffer_text)
-
-            for chunk in sub_chunks:
-                chunks.append({
-                    "text": chunk,
-                    "metadata": {
-                        "pages": buffer_pages.copy(),
-                        "chapters": []  # or detect inline if needed
-                    }
-                })
-
-            buffer_text = ""
-            buffer_pages = []
-
-    # flush remainder
-    if buffer_text.strip():
-        sub_chunks = splitter.split_text(buffer_text)
-        for chunk in sub_chunks:
-            chunks.append({
-                "text": chunk,
-                "metadata": {
-                    "pages": buffer_pages.copy(),
-                    "chapters": []
-                }
-            })
+    return iter_chunks(extract_pages(PDF_PATH), splitter)
 
     # for page in pages:
     #     sub_chunks = splitter.split_text(page["text"])
@@ -116,7 +132,6 @@ def chunks_for_embeddings(PDF_PATH):
     # full_text, page_map = build_text_with_metadata(pages)
     # chunks = splitter.split_text(full_text)
     # chunks = attach_metadata_to_chunks(chunks, page_map);
-    return chunks
 
 # Step 3: Create vector store from chunks
 def create_vector_store(PDF_PATH):
@@ -124,42 +139,28 @@ def create_vector_store(PDF_PATH):
     collection = chroma.get_collection("pdf_docs")
     print(f"Collection =======> {collection}"); 
     file_name = os.path.basename(PDF_PATH)
-    if collection.count() > 0:
-        print("collection already populated, skipping ingestion")
-        return
-    page_groups = defaultdict(list)
-    documents = []
-    metadatas = []
-    ids = []
-
-    for i, chunk in enumerate(chunks):
-        print(f"[INFO] Progressing -- {i+1}/{len(chunks)}")
-        documents.append(chunk["text"])
-        metadatas.append({
-            "source": file_name,
-            "pages": ",".join(map(str, chunk["metadata"]["pages"])),
-            "chapters": ",".join(chunk["metadata"]["chapters"]) or "unknown"
-        })
-        ids.append(f"doc_{i}")
-        print(f"len(documents): {len(documents)}")
-        if len(documents) == BATCH_SIZE:
-            collection.add(
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
-            )
-            # Cleaing the batch
-            documents.clear()
-            metadatas.clear()
-            ids.clear()
 
-    # flush remainder
-    if documents:
-        collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
+    def records():
+        for chunk in chunks:
+            meta = {
+                "source": file_name,
+                "pages": ",".join(map(str, chunk["metadata"]["pages"])),
+                "chapters": ",".join(chunk["metadata"]["chapters"]) or "unknown",
+                "articles": ",".join(map(str, chunk["metadata"]["articles"])),
+                "start": chunk["metadata"]["start"],
+                "end": chunk["metadata"]["end"],
+            }
+            # Article in effect at the chunk start, filterable with where={"article": n}
+            if chunk["metadata"]["articles"]:
+                meta["article"] = chunk["metadata"]["articles"][0]
+            yield chunk["text"], meta
+
+    # Content-hash ids: only new / changed chunks are embedded, stale ones removed.
+    # Chunks stream from the PDF into ingestion, never collected in full
+    sync_document(collection, file_name, records())
+
+    # Keyword index over the same chunks for hybrid retrieval
+    build_bm25_index(collection)
 
     # for i in range(0, len(documents), BATCH_SIZE):
     #     collection.add(
@@ -199,35 +200,19 @@ def normalize_mcqs_output(raw_output):
 
 
 def attach_metadata_to_chunks(chunks, page_map):
+    index = ProvenanceIndex()
+    for entry in page_map:
+        index.add_page(entry["start"], entry["end"], entry["page_number"], entry["chapter"])
+
     enriched_chunks = []
     cursor = 0
 
     for chunk in chunks:
         chunk_len = len(chunk)
-        chunk_start = cursor
-        chunk_end = cursor + chunk_len
-
-        pages = {
-            entry["page_number"]
-            for entry in page_map
-            if not (chunk_end < entry["start"] or chunk_start > entry["end"])
-        }
-
-        chapters = {
-            entry["chapter"]
-            for entry in page_map
-            if not (chunk_end < entry["start"] or chunk_start > entry["end"])
-            and entry["chapter"] is not None
-        }
-
         enriched_chunks.append({
             "text": chunk,
-            "metadata": {
-                "pages": sorted(pages),
-                "chapters": sorted(chapters)
-            }
+            "metadata": index.metadata_for(cursor, cursor + chunk_len)
         })
-
         cursor += chunk_len
 
     return enriched_chunks
@@ -0,0 +1,250 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import time
+
+import tiktoken
+
+from clients.chroma_client import VECTORSTORE_DIR
+from clients.embedding_client import embeddings
+from exam.noise_filter import BOE_NOISE
+from config import (
+    EMBED_BATCH_TOKENS,
+    EMBED_BATCH_MAX,
+    EMBED_CONCURRENCY,
+    WRITE_BATCH_SIZE,
+)
+
+MANIFEST_FILE = VECTORSTORE_DIR / "manifest.json"
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    global _encoding
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def with_noise_flags(documents: list[str], metadatas) -> list[dict]:
+    """
+    Records noise at ingestion so retrieval can exclude it with a where
+    clause. Metadata that already carries the flag is kept as is.
+    """
+    metadatas = list(metadatas)
+    missing = [i for i, meta in enumerate(metadatas) if "noise" not in meta]
+    flags = BOE_NOISE.flags([documents[i] for i in missing])
+    for i, flag in zip(missing, flags):
+        metadatas[i] = {**metadatas[i], "noise": flag}
+    return metadatas
+
+
+class IngestionEngine:
+    """
+    Embeds and stores chunks at throughput:
+    - chunks are packed into token-budgeted embedding batches
+    - up to `concurrency` embedding requests run at once
+    - Chroma writes happen in large upsert transactions
+    """
+
+    def __init__(self, collection, batch_tokens: int = EMBED_BATCH_TOKENS,
+                 batch_max: int = EMBED_BATCH_MAX, concurrency: int = EMBED_CONCURRENCY,
+                 write_batch: int = WRITE_BATCH_SIZE):
+        self.collection = collection
+        self.batch_tokens = batch_tokens
+        self.batch_max = batch_max
+        self.concurrency = concurrency
+        self.write_batch = write_batch
+
+    def _batches(self, documents, metadatas, ids):
+        batch, tokens = [], 0
+        for doc, meta, id_ in zip(documents, metadatas, ids):
+            n = count_tokens(doc)
+            if batch and (tokens + n > self.batch_tokens or len(batch) >= self.batch_max):
+                yield batch, tokens
+                batch, tokens = [], 0
+            batch.append((doc, meta, id_))
+            tokens += n
+        if batch:
+            yield batch, tokens
+
+    def _embed(self, batch):
+        return embeddings.embed([doc for doc, _, _ in batch])
+
+    def _write(self, pending):
+        self.collection.upsert(
+            ids=[p[2] for p in pending],
+            documents=[p[0] for p in pending],
+            metadatas=[p[1] for p in pending],
+            embeddings=[p[3] for p in pending],
+        )
+
+    def ingest(self, documents, metadatas, ids) -> dict:
+        documents = list(documents)
+        metadatas = with_noise_flags(documents, metadatas)
+
+        started = time.monotonic()
+        stats = {"chunks": 0, "tokens": 0}
+        pending = []
+
+        def drain(future, batch, tokens):
+            for (doc, meta, id_), emb in zip(batch, future.result()):
+                pending.append((doc, meta, id_, emb))
+            stats["chunks"] += len(batch)
+            stats["tokens"] += tokens
+
+            if len(pending) >= self.write_batch:
+                self._write(pending)
+                pending.clear()
+                self._report(stats, started)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            # Sliding window keeps memory bounded while requests overlap
+            window = deque()
+            for batch, tokens in self._batches(documents, metadatas, ids):
+                window.append((pool.submit(self._embed, batch), batch, tokens))
+                if len(window) >= self.concurrency * 2:
+                    drain(*window.popleft())
+            while window:
+                drain(*window.popleft())
+
+        if pending:
+            self._write(pending)
+
+        return self._report(stats, started)
+
+    def _report(self, stats, started) -> dict:
+        elapsed = max(time.monotonic() - started, 1e-6)
+        stats["seconds"] = round(elapsed, 1)
+        stats["chunks_per_sec"] = round(stats["chunks"] / elapsed, 1)
+        stats["tokens_per_sec"] = round(stats["tokens"] / elapsed, 1)
+        print(
+            f"[INGEST] {stats['chunks']} chunks, {stats['tokens']} tokens in {stats['seconds']}s "
+            f"({stats['chunks_per_sec']} chunks/s, {stats['tokens_per_sec']} tokens/s)"
+        )
+        return stats
+
+
+# ------------------ Incremental re-ingestion ------------------
+def make_document_id(path: str) -> str:
+    return hashlib.sha256(path.encode("utf-8")).hexdigest()[:16]
+
+
+def make_chunk_id(document_id: str, text: str) -> str:
+    # Same content -> same id, so unchanged chunks are never re-embedded
+    return f"{document_id}_{hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]}"
+
+
+class Manifest:
+    """
+    {"<collection>/<document_id>": {"source": name, "chunks": {chunk_id: {"pages": "3,4", ..}}}}
+
+    Entries are per collection: the same PDF synced into two collections
+    is tracked separately in each.
+    """
+
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = path
+        self.documents = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+    @staticmethod
+    def _key(collection_name: str, document_id: str) -> str:
+        return f"{collection_name}/{document_id}"
+
+    def chunks(self, collection_name: str, document_id: str):
+        entry = self.documents.get(self._key(collection_name, document_id))
+        return None if entry is None else entry["chunks"]
+
+    def set_document(self, collection_name: str, document_id: str, source: str, chunks: dict):
+        self.documents[self._key(collection_name, document_id)] = {"source": source, "chunks": chunks}
+
+    def save(self):
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.documents, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self.path)
+
+
+def _provenance(meta: dict) -> dict:
+    # "noise" is tracked too: entries written before the flag existed differ
+    # and get their metadata refreshed, so every chunk ends up flagged
+    return {k: meta[k] for k in ("pages", "articles", "start", "end", "noise") if k in meta}
+
+
+def sync_document(collection, source: str, chunks, manifest: Manifest = None,
+                  legacy_where: dict = None) -> dict:
+    """
+    Brings the collection in line with the current chunks of one document:
+    embeds only new / changed chunks and deletes stale ones.
+
+    `chunks` yields (text, metadata) pairs and may be a generator: chunks
+    are embedded in batches as they arrive, and only ids and provenance
+    are kept for the stale check and the manifest.
+
+    Without a manifest entry, chunks matching `legacy_where` (default:
+    {"source": source}) are taken over: old positional-id chunks (no
+    document_id metadata) and this document's own. Chunks another document
+    already synced are left alone.
+    """
+    manifest = manifest or Manifest()
+    document_id = make_document_id(source)
+
+    existing = manifest.chunks(collection.name, document_id)
+    if existing is None:
+        # No manifest entry yet (e.g. legacy positional ids): ask Chroma
+        legacy = collection.get(where=legacy_where or {"source": source}, include=["metadatas"])
+        existing = {
+            cid: {} for cid, meta in zip(legacy["ids"], legacy["metadatas"])
+            if (meta or {}).get("document_id", document_id) == document_id
+        }
+
+    engine = IngestionEngine(collection)
+    current = {}  # chunk id -> provenance, in document order
+    new, moved = [], []
+    counts = {"new": 0, "moved": 0}
+
+    def flush_new():
+        engine.ingest([d for d, _, _ in new], [m for _, m, _ in new], [c for _, _, c in new])
+        counts["new"] += len(new)
+        new.clear()
+
+    def flush_moved():
+        collection.update(ids=[c for c, _ in moved], metadatas=[m for _, m in moved])
+        counts["moved"] += len(moved)
+        moved.clear()
+
+    for doc, meta in chunks:
+        chunk_id = make_chunk_id(document_id, doc)
+        if chunk_id in current:
+            continue
+        meta = {**with_noise_flags([doc], [meta])[0], "document_id": document_id}
+        current[chunk_id] = _provenance(meta)
+
+        if chunk_id not in existing:
+            new.append((doc, meta, chunk_id))
+            if len(new) >= WRITE_BATCH_SIZE:
+                flush_new()
+        elif existing[chunk_id] != current[chunk_id]:
+            # Same text at a different position (or not yet noise-flagged):
+            # refresh metadata without re-embedding
+            moved.append((chunk_id, meta))
+            if len(moved) >= WRITE_BATCH_SIZE:
+                flush_moved()
+
+    if new:
+        flush_new()
+    if moved:
+        flush_moved()
+
+    stale_ids = [cid for cid in existing if cid not in current]
+    for i in range(0, len(stale_ids), WRITE_BATCH_SIZE):
+        collection.delete(ids=stale_ids[i:i + WRITE_BATCH_SIZE])
+
+    print(f"[SYNC] {source}: {counts['new']} new, {len(stale_ids)} stale, "
+          f"{len(current) - counts['new']} unchanged")
+
+    manifest.set_document(collection.name, document_id, source, current)
+    manifest.save()
+
+    return {"new": counts["new"], "stale": len(stale_ids), "total": len(current)}
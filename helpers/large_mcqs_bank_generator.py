@@ -1,5 +1,4 @@
 from pathlib import Path
-import json
 import sys
 import time
 import hashlib
@@ -9,10 +8,16 @@ sys.path.insert(0, str(BASE_DIR))
 
 from clients.chroma_client import chroma
 from clients.llm_client import llm
-from config import MCQS_PER_WINDOW
+from config import MCQS_PER_WINDOW, MCQ_GEN_STREAMING
+from helpers.checkpoint import JsonlCheckpoint, chunk_id
+from helpers.near_duplicates import NearDuplicateIndex, save_vectors
+from helpers.mcq_parser import MCQ_RESPONSE_FORMAT, ParseYield, parse_mcq_output, stream_mcqs
 
 OUTPUT_FILE = BASE_DIR / "data" / "mcqs" / "large_mcq_bank.json"
+CHECKPOINT_FILE = OUTPUT_FILE.with_suffix(".jsonl")
+VECTORS_FILE = OUTPUT_FILE.with_suffix(".vectors.npz")
 OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
+parse_yield = ParseYield()
 
 SYSTEM_PROMPT = """
 You are a high-quality exam question generator for Spanish traffic theory.
@@ -31,37 +36,16 @@ Context:
 {context_text}
 """
 
-def safe_load_json(text: str):
-    """
-    Safely parse JSON — returns [] on failure.
-    """
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        return []
-
-def extract_list(parsed):
-    """
-    Unwraps common output shapes:
-    - {"questions":[...]} -> returns list
-    - list[...] -> returns list
-    - otherwise -> []
-    """
-    if isinstance(parsed, dict):
-        if "questions" in parsed and isinstance(parsed["questions"], list):
-            return parsed["questions"]
-        return []
-    if isinstance(parsed, list):
-        return parsed
-    return []
-
 def generate_mcqs(context, count):
     prompt = SYSTEM_PROMPT.format(n=count, context_text=context)
     messages = [{"role":"user", "content": prompt}]
-    rsp = llm.chat(messages)
+    if MCQ_GEN_STREAMING:
+        # Questions as they are decoded; the stream closes after `count`
+        tokens = llm.stream(messages, response_format=MCQ_RESPONSE_FORMAT)
+        return stream_mcqs(tokens, limit=count, metric=parse_yield)
+    rsp = llm.chat(messages, response_format=MCQ_RESPONSE_FORMAT)
     raw = rsp.choices[0].message.content.strip()
-    parsed = safe_load_json(raw)
-    return extract_list(parsed)
+    return parse_mcq_output(raw, parse_yield)
 
 def hash_question(question_text: str) -> str:
     """
@@ -80,40 +64,52 @@ def main():
 
     print(f"[INFO] Total chunks found: {len(chunk_texts)}")
 
-    large_bank = []
-    seen = set()
+    # Resume from the append-only checkpoint (seeded from an existing bank)
+    checkpoint = JsonlCheckpoint(CHECKPOINT_FILE)
+    large_bank, done = checkpoint.load(seed_from=OUTPUT_FILE)
+    seen = {hash_question(q["question"]) for q in large_bank}
+    # Paraphrases slip past the exact hash; compare embeddings too
+    near_dups = NearDuplicateIndex()
+    near_dups.seed([q["question"] for q in large_bank], cache_path=VECTORS_FILE)
+
+    try:
+        for i, chunk in enumerate(chunk_texts):
+            if i % 50 == 0:
+                print(f"[PROGRESS] Processing chunk {i}/{len(chunk_texts)}")
 
-    # Load existing bank if it exists
-    if OUTPUT_FILE.exists():
-        with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-            large_bank = json.load(f)
-            for q in large_bank:
-                seen.add(hash_question(q["question"]))
+            cid = chunk_id(chunk)
+            if cid in done:
+                continue
 
-    for i, chunk in enumerate(chunk_texts):
-        if i % 50 == 0:
-            print(f"[PROGRESS] Processing chunk {i}/{len(chunk_texts)}")
+            mcqs = generate_mcqs(chunk, MCQS_PER_WINDOW * 2)
 
-        mcqs = generate_mcqs(chunk, MCQS_PER_WINDOW * 2)
+            # Each question is checked and written while the rest decodes
+            for q in mcqs:
+                # Check required fields
+                question_text = q.get("question")
+                if not question_text:
+                    continue
 
-        for q in mcqs:
-            # Check required fields
-            question_text = q.get("question")
-            if not question_text:
-                continue
+                q_hash = hash_question(question_text)
+                if q_hash in seen:
+                    continue
 
-            q_hash = hash_question(question_text)
-            if q_hash in seen:
-                continue
+                seen.add(q_hash)
+                if near_dups.check([question_text])[0]:
+                    large_bank.append(q)
+                    checkpoint.append(q)
 
-            seen.add(q_hash)
-            large_bank.append(q)
+            checkpoint.mark_done(cid)
 
-        # Save periodically to avoid memory spikes
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-            json.dump(large_bank, f, ensure_ascii=False, indent=2)
+            time.sleep(1.5)
+    finally:
+        checkpoint.close()
+        save_vectors(VECTORS_FILE, near_dups.vectors, [q["question"] for q in large_bank])
+    print(f"[DEDUP] {near_dups.stats}")
+    print(f"[PARSE] {parse_yield}")
 
-        time.sleep(1.5)
+    # Compact the append-only log into the final JSON array bank
+    checkpoint.compact(OUTPUT_FILE)
 
     print(f"[DONE] Generated {len(large_bank)} MCQs")
     print("Saved to:", OUTPUT_FILE)
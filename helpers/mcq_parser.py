@@ -0,0 +1,271 @@
+import re
+
+import orjson
+
+_SPECIAL = re.compile(r'[{}"\\]')
+
+# Wrapper keys the models use for the question list
+LIST_KEYS = ("questions", "preguntas")
+
+MCQ_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "questions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "question": {"type": "string"},
+                    "options": {
+                        "type": "object",
+                        "properties": {k: {"type": "string"} for k in "ABCD"},
+                        "required": list("ABCD"),
+                    },
+                    "correct_answer": {"type": "string", "enum": list("ABCD")},
+                    "explanation": {"type": "string"},
+                    "topic_name": {"type": "string"},
+                    "source": {"type": "string"},
+                },
+                "required": ["question", "options", "correct_answer", "explanation",
+                             "topic_name", "source"],
+            },
+        },
+    },
+    "required": ["questions"],
+}
+
+# OpenAI-style structured output; LocalAI turns it into a decoding grammar
+MCQ_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "mcq_batch", "schema": MCQ_SCHEMA, "strict": True},
+}
+
+
+def extract_list(parsed):
+    """
+    Unwraps common output shapes:
+    - {"questions":[...]} / {"preguntas":[...]} -> returns list
+    - list[...] -> returns list
+    - a single question object -> [object]
+    - otherwise -> []
+    """
+    if isinstance(parsed, dict):
+        for key in LIST_KEYS:
+            if isinstance(parsed.get(key), list):
+                return parsed[key]
+        return [parsed] if "question" in parsed else []
+    if isinstance(parsed, list):
+        return parsed
+    return []
+
+
+class McqStreamParser:
+    """
+    Incremental salvage parser for LLM output.
+
+    feed() accepts text in any slices and returns the question objects
+    completed by that slice. It tracks string / escape state and brace
+    depth, so it only hands balanced {...} spans to orjson: prose, markdown
+    fences and a truncated tail are skipped, and every complete object
+    carrying a "question" key is recovered.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._in_string = False
+        self._starts = []  # buffer offsets of the open "{"
+
+    def feed(self, text: str) -> list[dict]:
+        self._buffer += text
+        found = []
+        buf = self._buffer
+        i = self._pos
+        n = len(buf)
+
+        # Jump between structural characters instead of walking every char
+        while True:
+            m = _SPECIAL.search(buf, i)
+            if m is None:
+                break
+            i = m.start()
+            c = buf[i]
+            if self._in_string:
+                if c == "\\":
+                    if i + 1 >= n:
+                        # Escape split across feeds: resume on it next time
+                        break
+                    i += 1
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c == "{":
+                self._starts.append(i)
+            elif c == "}" and self._starts:
+                start = self._starts.pop()
+                obj = self._load(buf[start:i + 1])
+                if isinstance(obj, dict) and "question" in obj:
+                    found.append(obj)
+            i += 1
+
+        if m is None:
+            i = n
+
+        # Keep only what an open object may still need
+        cut = min(self._starts[0] if self._starts else i, i)
+        if cut:
+            self._buffer = buf[cut:]
+            self._starts = [s - cut for s in self._starts]
+            i -= cut
+        self._pos = i
+        return found
+
+    @property
+    def complete(self) -> bool:
+        # No object left open: the output was not cut off mid-question
+        return not self._starts
+
+    @staticmethod
+    def _load(span: str):
+        try:
+            return orjson.loads(span)
+        except orjson.JSONDecodeError:
+            return None
+
+
+class ParseYield:
+    """
+    Per-run parse metric: how many responses parsed cleanly, needed
+    salvage or yielded nothing, and how many questions were recovered.
+    """
+
+    def __init__(self):
+        self.stats = {"responses": 0, "clean": 0, "salvaged": 0, "failed": 0, "questions": 0}
+
+    def record(self, outcome: str, questions: int):
+        self.stats["responses"] += 1
+        self.stats[outcome] += 1
+        self.stats["questions"] += questions
+
+    @property
+    def rate(self) -> float:
+        # Share of LLM calls that produced at least one question
+        responses = self.stats["responses"]
+        return (responses - self.stats["failed"]) / responses if responses else 0.0
+
+    def __str__(self):
+        return f"{self.stats} yield={self.rate:.1%}"
+
+
+def _option_keys(options) -> list[str]:
+    """
+    Keys an answer can name: dict options use their own keys, list
+    options (the question bank's shape) are lettered by position.
+    """
+    if isinstance(options, dict):
+        return list(options)
+    if isinstance(options, list):
+        return [chr(ord("A") + i) for i in range(len(options))]
+    return []
+
+
+def is_valid_mcq(q) -> bool:
+    """
+    Question text, options A-D and a correct answer naming one of them.
+    Options may be the MCQ_SCHEMA {"A": ...} dict or a list as stored in
+    the bank, where the answer may also be the "A) ..." option or its text.
+    """
+    if not isinstance(q, dict) or not q.get("question"):
+        return False
+    options = q.get("options")
+    keys = _option_keys(options)
+    answer = q.get("correct_answer")
+    if not set(keys) >= set("ABCD") or not isinstance(answer, str):
+        return False
+    if answer in keys:
+        return True
+    return isinstance(options, list) and (
+        answer in options or answer[:2] in {k + ")" for k in keys}
+    )
+
+
+def parse_mcq_output(text: str, metric: ParseYield = None) -> list[dict]:
+    """
+    Parses one LLM response into valid question dicts (see is_valid_mcq),
+    the same ones stream_mcqs would yield.
+    Well-formed JSON takes the fast path; anything else is salvaged
+    object by object instead of discarding the whole call.
+    """
+    text = (text or "").strip()
+    outcome, mcqs = "clean", []
+    try:
+        mcqs = [q for q in extract_list(orjson.loads(text)) if is_valid_mcq(q)]
+    except orjson.JSONDecodeError:
+        outcome = "salvaged"
+
+    if not mcqs:
+        mcqs = [q for q in McqStreamParser().feed(text) if is_valid_mcq(q)]
+        outcome = "salvaged" if mcqs else "failed"
+
+    if metric is not None:
+        metric.record(outcome, len(mcqs))
+    return mcqs
+
+
+def _record_stream(metric: ParseYield, parser: McqStreamParser, count: int, stopped: bool):
+    if metric is None:
+        return
+    if not count:
+        metric.record("failed", 0)
+    else:
+        metric.record("clean" if stopped or parser.complete else "salvaged", count)
+
+
+def stream_mcqs(tokens, limit: int = None, metric: ParseYield = None):
+    """
+    Yields each valid question from a token stream as soon as its closing
+    brace arrives; malformed ones are dropped. Stops (closing the token
+    stream) once `limit` questions were yielded, so the server stops
+    decoding the rest.
+    """
+    parser = McqStreamParser()
+    valid = 0
+    stopped = False
+    try:
+        for token in tokens:
+            for q in parser.feed(token):
+                if not is_valid_mcq(q):
+                    continue
+                yield q
+                valid += 1
+                if limit is not None and valid >= limit:
+                    stopped = True
+                    return
+    finally:
+        if hasattr(tokens, "close"):
+            tokens.close()
+        _record_stream(metric, parser, valid, stopped)
+
+
+async def astream_mcqs(tokens, limit: int = None, metric: ParseYield = None):
+    """
+    Async variant of stream_mcqs over an async token iterator.
+    """
+    parser = McqStreamParser()
+    valid = 0
+    stopped = False
+    try:
+        async for token in tokens:
+            for q in parser.feed(token):
+                if not is_valid_mcq(q):
+                    continue
+                yield q
+                valid += 1
+                if limit is not None and valid >= limit:
+                    stopped = True
+                    return
+    finally:
+        if hasattr(tokens, "aclose"):
+            await tokens.aclose()
+        _record_stream(metric, parser, valid, stopped)
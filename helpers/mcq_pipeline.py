@@ -0,0 +1,167 @@
+import asyncio
+import random
+import time
+
+import openai
+
+_DONE = object()
+
+
+class AdaptiveBackoff:
+    """
+    Shared delay for all generation workers.
+    Doubles (with jitter) on errors / 429s, decays on success.
+    """
+
+    def __init__(self, base: float = 0.5, maximum: float = 30.0):
+        self.base = base
+        self.maximum = maximum
+        self.delay = 0.0
+
+    async def wait(self):
+        if self.delay:
+            await asyncio.sleep(self.delay * random.uniform(0.5, 1.0))
+
+    def failure(self, retry_after: float = 0.0):
+        self.delay = min(self.maximum, max(self.base, self.delay * 2, retry_after))
+
+    def success(self):
+        self.delay = self.delay / 2 if self.delay > self.base else 0.0
+
+
+def _retry_after(exc) -> float:
+    response = getattr(exc, "response", None)
+    if response is None:
+        return 0.0
+    try:
+        return float(response.headers.get("retry-after", 0))
+    except ValueError:
+        return 0.0
+
+
+async def _stage(fn, inbox, outbox, workers: int):
+    async def worker():
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                # Let sibling workers see the end of input too
+                await inbox.put(_DONE)
+                return
+            result = await fn(item)
+            if result is not None:
+                await outbox.put(result)
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    await outbox.put(_DONE)
+
+
+async def run_pipeline(items, retrieve, generate, parse, sink,
+                       concurrency: int = 4, queue_size: int = 16,
+                       max_retries: int = 3, stream=None):
+    """
+    retrieve -> generate -> parse -> sink, connected by bounded queues.
+
+    retrieve(item) and parse(raw) are blocking callables run in threads,
+    generate(context) is a coroutine returning raw LLM text and
+    sink(item, mcqs, done) is called from a single consumer (in a thread,
+    one call at a time) so it may own dedup state and writes.
+    Returning None from retrieve skips the item.
+
+    With `stream`, stream(context) is an async iterator of questions that
+    replaces generate + parse: each question reaches the sink as soon as
+    it is decoded (done=False) and a final call with done=True closes the
+    item, so dedup and writes overlap with decoding. An item whose every
+    attempt failed before any question arrived is never closed.
+    """
+    backoff = AdaptiveBackoff()
+    attempts = max_retries + 1  # first call plus max_retries retries
+    stats = {"items": 0, "llm_calls": 0, "llm_errors": 0}
+    started = time.monotonic()
+
+    chunks = asyncio.Queue(queue_size)
+    contexts = asyncio.Queue(queue_size)
+    raws = asyncio.Queue(queue_size)
+    parsed = asyncio.Queue(queue_size)
+
+    async def produce():
+        for item in items:
+            await chunks.put(item)
+        await chunks.put(_DONE)
+
+    async def do_retrieve(item):
+        context = await asyncio.to_thread(retrieve, item)
+        return (item, context) if context else None
+
+    async def do_generate(entry):
+        item, context = entry
+        for attempt in range(attempts):
+            await backoff.wait()
+            stats["llm_calls"] += 1
+            try:
+                raw = await generate(context)
+            except openai.APIError as e:
+                stats["llm_errors"] += 1
+                backoff.failure(_retry_after(e))
+                print(f"[WARN] LLM call failed ({attempt + 1}/{attempts}): {e}")
+                continue
+            backoff.success()
+            return item, raw
+        return None
+
+    async def do_parse(entry):
+        item, raw = entry
+        return item, await asyncio.to_thread(parse, raw), True
+
+    async def do_stream(entry):
+        item, context = entry
+        emitted = 0
+        for attempt in range(attempts):
+            await backoff.wait()
+            stats["llm_calls"] += 1
+            try:
+                async for q in stream(context):
+                    emitted += 1
+                    await parsed.put((item, [q], False))
+            except openai.APIError as e:
+                stats["llm_errors"] += 1
+                backoff.failure(_retry_after(e))
+                print(f"[WARN] LLM stream failed ({attempt + 1}/{attempts}): {e}")
+                if emitted:
+                    # Keep what arrived; a retry would mostly repeat it
+                    break
+                continue
+            backoff.success()
+            break
+        if not emitted:
+            # Nothing arrived: leave the chunk pending so a resume retries it
+            return None
+        return item, [], True
+
+    async def consume():
+        while True:
+            entry = await parsed.get()
+            if entry is _DONE:
+                return
+            item, mcqs, done = entry
+            # Still one call at a time, but off the loop: the sink may embed
+            await asyncio.to_thread(sink, item, mcqs, done)
+            if done:
+                stats["items"] += 1
+
+    if stream is not None:
+        stages = [_stage(do_stream, contexts, parsed, concurrency)]
+    else:
+        stages = [
+            _stage(do_generate, contexts, raws, concurrency),
+            _stage(do_parse, raws, parsed, 1),
+        ]
+
+    await asyncio.gather(
+        produce(),
+        _stage(do_retrieve, chunks, contexts, 2),
+        *stages,
+        consume(),
+    )
+
+    stats["seconds"] = round(time.monotonic() - started, 1)
+    return stats
@@ -0,0 +1,175 @@
+from pathlib import Path
+import hashlib
+
+import numpy as np
+
+from clients.embedding_client import embeddings
+from config import NEAR_DUP_THRESHOLD, EMBED_BATCH_MAX
+
+CLUSTER_BLOCK = 1024  # rows compared per matmul in offline clustering
+
+
+def embed_texts(texts: list[str], embed=None, batch_size: int = EMBED_BATCH_MAX) -> np.ndarray:
+    """
+    Embeds texts in batches and returns an L2-normalised float32 matrix.
+    """
+    embed = embed or embeddings.embed
+    rows = []
+    for i in range(0, len(texts), batch_size):
+        rows.extend(embed(texts[i:i + batch_size]))
+    if not rows:
+        return np.zeros((0, 0), dtype=np.float32)
+    matrix = np.asarray(rows, dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    return matrix
+
+
+def _digest(texts: list[str]) -> str:
+    h = hashlib.sha256()
+    for t in texts:
+        h.update(t.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def save_vectors(path: Path, vectors: np.ndarray, texts: list[str]):
+    """
+    Stores question vectors with a digest of the texts they were built from.
+    """
+    tmp = path.with_name(path.name + ".tmp.npz")
+    np.savez(tmp, vectors=vectors, digest=np.array(_digest(texts[:len(vectors)])))
+    tmp.replace(path)
+
+
+def load_vectors(path: Path, texts: list[str]):
+    """
+    Returns saved vectors when they were built from a prefix of `texts`,
+    otherwise None (bank edited, deduplicated or reordered).
+    """
+    if not path.exists():
+        return None
+    with np.load(path) as data:
+        vectors, digest = data["vectors"], str(data["digest"])
+    if len(vectors) > len(texts) or digest != _digest(texts[:len(vectors)]):
+        return None
+    return vectors
+
+
+class NearDuplicateIndex:
+    """
+    Embeddings of accepted questions, grown as generation streams.
+
+    check() embeds a batch of candidates, compares them with every accepted
+    question in one matmul and with the earlier candidates of the same
+    batch, and accepts only those below `threshold` cosine similarity.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD, embed=None,
+                 batch_size: int = EMBED_BATCH_MAX):
+        self.threshold = threshold
+        self.embed = embed or embeddings.embed
+        self.batch_size = batch_size
+        self._matrix = None
+        self._size = 0
+        self.stats = {"checked": 0, "rejected": 0}
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._matrix[:self._size] if self._matrix is not None else np.zeros((0, 0), np.float32)
+
+    def _append(self, vectors: np.ndarray):
+        if not len(vectors):
+            return
+        if self._matrix is None:
+            self._matrix = np.empty((max(len(vectors), 1024), vectors.shape[1]), dtype=np.float32)
+        needed = self._size + len(vectors)
+        if needed > len(self._matrix):
+            # Amortised growth: double instead of re-stacking every batch
+            grown = np.empty((max(needed, 2 * len(self._matrix)), self._matrix.shape[1]), np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+        self._matrix[self._size:needed] = vectors
+        self._size = needed
+
+    def seed(self, texts: list[str], cache_path: Path = None):
+        """
+        Adds already accepted questions without checking them.
+        With `cache_path`, vectors saved by a previous run are reused for the
+        longest matching prefix of `texts`; only the rest is embedded.
+        """
+        cached = load_vectors(cache_path, texts) if cache_path is not None else None
+        if cached is not None:
+            self._append(cached)
+        done = len(self)
+        self._append(embed_texts(texts[done:], self.embed, self.batch_size))
+        print(f"[DEDUP] Seeded {len(self)} questions ({done} from cache)")
+
+    def check(self, texts: list[str]) -> list[bool]:
+        """
+        Returns one flag per text: True when it was accepted (and indexed).
+        """
+        if not texts:
+            return []
+        candidates = embed_texts(texts, self.embed, self.batch_size)
+
+        # Best match among accepted questions, all candidates in one matmul
+        if self._size:
+            best = (candidates @ self.vectors.T).max(axis=1)
+        else:
+            best = np.full(len(texts), -1.0, dtype=np.float32)
+
+        # Candidates of the same batch must not duplicate each other either
+        within = candidates @ candidates.T
+        accepted = []
+        for i in range(len(texts)):
+            ok = best[i] < self.threshold and all(within[i, j] < self.threshold for j in accepted)
+            if ok:
+                accepted.append(i)
+
+        self._append(candidates[accepted])
+        self.stats["checked"] += len(texts)
+        self.stats["rejected"] += len(texts) - len(accepted)
+
+        keep = set(accepted)
+        return [i in keep for i in range(len(texts))]
+
+
+def cluster_near_duplicates(vectors: np.ndarray, threshold: float = NEAR_DUP_THRESHOLD,
+                            block: int = CLUSTER_BLOCK) -> list[list[int]]:
+    """
+    Groups rows whose cosine similarity reaches `threshold` (transitively).
+
+    Similarities are computed block by block against the rows that follow,
+    so memory stays at block x n; only the pairs above the threshold reach
+    Python, where a union-find merges them. Returns clusters of size > 1,
+    each sorted so its first id is the earliest question.
+    """
+    n = len(vectors)
+    parent = np.arange(n)
+
+    def find(x):
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        sims = vectors[start:stop] @ vectors[start:].T
+        # Upper triangle only: each pair once, no self matches
+        sims[np.tril_indices(stop - start, 0, sims.shape[1])] = -1.0
+        rows, cols = np.nonzero(sims >= threshold)
+        for a, b in zip(rows + start, cols + start):
+            ra, rb = find(a), find(b)
+            if ra != rb:
+                parent[max(ra, rb)] = min(ra, rb)
+
+    groups = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+    return [g for g in groups.values() if len(g) > 1]
@@ -0,0 +1,117 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import hashlib
+import os
+import sqlite3
+import zlib
+
+from pypdf import PdfReader
+
+# No clients imports here: worker processes must not open Chroma
+BASE_DIR = Path(__file__).resolve().parent.parent
+PAGE_CACHE_FILE = BASE_DIR / "vectorstore" / "page_cache.sqlite3"
+
+
+def pdf_sha256(pdf_path) -> str:
+    h = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _extract_range(pdf_path: str, start: int, end: int):
+    # Runs in a worker process: each worker opens its own reader
+    reader = PdfReader(pdf_path)
+    return [(i + 1, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+class PageCache:
+    """
+    Per-page extracted text keyed by (pdf sha256, page number), zlib-compressed.
+    A document is only served from cache once all its pages were stored.
+    """
+
+    def __init__(self, path=PAGE_CACHE_FILE):
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "pdf_hash TEXT, page_number INTEGER, text BLOB, "
+            "PRIMARY KEY (pdf_hash, page_number))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents (pdf_hash TEXT PRIMARY KEY, page_count INTEGER)"
+        )
+        self._db.commit()
+
+    def page_count(self, pdf_hash: str):
+        row = self._db.execute(
+            "SELECT page_count FROM documents WHERE pdf_hash = ?", (pdf_hash,)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def iter_pages(self, pdf_hash: str):
+        rows = self._db.execute(
+            "SELECT page_number, text FROM pages WHERE pdf_hash = ? ORDER BY page_number",
+            (pdf_hash,),
+        )
+        for n, t in rows:
+            yield n, zlib.decompress(t).decode("utf-8")
+
+    def put_pages(self, pdf_hash: str, pages):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?)",
+            ((pdf_hash, n, zlib.compress(t.encode("utf-8"))) for n, t in pages),
+        )
+        self._db.commit()
+
+    def mark_complete(self, pdf_hash: str, page_count: int):
+        self._db.execute(
+            "INSERT OR REPLACE INTO documents VALUES (?, ?)", (pdf_hash, page_count)
+        )
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+def extract_page_texts(pdf_path, workers: int = None):
+    """
+    Yields (page_number, text) for every page in order, from the cache when
+    possible and otherwise splitting the page range across a process pool.
+    Pages are streamed: only the ranges in flight are held in memory.
+    """
+    pdf_hash = pdf_sha256(pdf_path)
+    cache = PageCache()
+    try:
+        count = cache.page_count(pdf_hash)
+        if count is not None:
+            print(f"[CACHE] {count} pages loaded for {os.path.basename(pdf_path)}")
+            yield from cache.iter_pages(pdf_hash)
+            return
+
+        total = len(PdfReader(str(pdf_path)).pages)
+        workers = workers or os.cpu_count() or 1
+        # Several slices per worker so a slow range does not stall the pool
+        step = max(1, -(-total // (workers * 4)))
+        ranges = deque((s, min(s + step, total)) for s in range(0, total, step))
+
+        done = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Sliding window of submitted ranges, consumed in page order
+            window = deque()
+            while ranges or window:
+                while ranges and len(window) < workers * 2:
+                    s, e = ranges.popleft()
+                    window.append(pool.submit(_extract_range, str(pdf_path), s, e))
+                pages = window.popleft().result()
+                cache.put_pages(pdf_hash, pages)
+                done += len(pages)
+                print(f"Pages extracted: {done}/{total}")
+                yield from pages
+
+        # Served from cache only once every page was stored
+        cache.mark_complete(pdf_hash, total)
+    finally:
+        cache.close()
@@ -0,0 +1,78 @@
+from bisect import bisect_left, bisect_right
+import re
+
+# BOE article headings, e.g. "Artículo 23." / "Articulo 5 bis", at the start
+# of a line and capitalised, so inline references ("según el artículo 12")
+# do not open a new article
+ARTICLE_START_RE = re.compile(r"^[ \t]*Art[íi]culo\s+(\d+)", re.MULTILINE)
+
+
+class ProvenanceIndex:
+    """
+    Maps character spans of the page stream to pages, chapters and BOE
+    article numbers with bisect over sorted offset arrays.
+
+    Pages are added in order; drop_before() releases entries a streaming
+    caller no longer needs while keeping the article in effect.
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._ends = []
+        self._pages = []
+        self._chapters = []
+        self._article_offsets = []
+        self._article_numbers = []
+
+    def add_page(self, start: int, end: int, page_number: int, chapter=None, text: str = ""):
+        """
+        Registers page [start, end); `text` is scanned for article headings.
+        """
+        self._starts.append(start)
+        self._ends.append(end)
+        self._pages.append(page_number)
+        self._chapters.append(chapter)
+
+        for m in ARTICLE_START_RE.finditer(text):
+            self._article_offsets.append(start + m.start())
+            self._article_numbers.append(int(m.group(1)))
+
+    def _page_range(self, start: int, end: int):
+        # Pages overlapping [start, end): first whose end is past start,
+        # up to the last that begins before end
+        return bisect_right(self._ends, start), bisect_left(self._starts, end)
+
+    def pages_for(self, start: int, end: int) -> list[int]:
+        lo, hi = self._page_range(start, end)
+        return self._pages[lo:hi]
+
+    def chapters_for(self, start: int, end: int) -> list[str]:
+        lo, hi = self._page_range(start, end)
+        return sorted({c for c in self._chapters[lo:hi] if c})
+
+    def articles_for(self, start: int, end: int) -> list[int]:
+        """
+        The article in effect at `start` followed by every article that
+        begins inside the span.
+        """
+        lo = bisect_right(self._article_offsets, start) - 1
+        hi = bisect_left(self._article_offsets, end)
+        numbers = self._article_numbers[max(lo, 0):hi]
+        return list(dict.fromkeys(numbers))
+
+    def drop_before(self, offset: int):
+        cut = bisect_right(self._ends, offset)
+        del self._starts[:cut], self._ends[:cut], self._pages[:cut], self._chapters[:cut]
+
+        # Keep the last article that started before offset: it is still in effect
+        cut = max(bisect_right(self._article_offsets, offset) - 1, 0)
+        del self._article_offsets[:cut], self._article_numbers[:cut]
+
+    def metadata_for(self, start: int, end: int) -> dict:
+        return {
+            "pages": self.pages_for(start, end),
+            "chapters": self.chapters_for(start, end),
+            "articles": self.articles_for(start, end),
+            "start": start,
+            "end": end,
+        }
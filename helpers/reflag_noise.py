@@ -0,0 +1,41 @@
+from pathlib import Path
+import sys
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from clients.chroma_client import chroma
+from exam.noise_filter import BOE_NOISE
+
+PAGE_SIZE = 5000
+
+
+def main():
+    """
+    Full re-flag pass: writes the "noise" metadata flag on every chunk of
+    pdf_docs, so retrieval can filter noise with a where clause.
+    """
+    collection = chroma.get_collection("pdf_docs")
+    total = collection.count()
+    print(f"[INFO] Re-flagging {total} chunks")
+
+    updated = 0
+    for offset in range(0, total, PAGE_SIZE):
+        page = collection.get(include=["documents", "metadatas"], limit=PAGE_SIZE, offset=offset)
+        ids, metadatas = [], []
+        for id_, doc, meta, flag in zip(
+            page["ids"], page["documents"], page["metadatas"], BOE_NOISE.flags(page["documents"])
+        ):
+            meta = meta or {}
+            if meta.get("noise") != flag:
+                ids.append(id_)
+                metadatas.append({**meta, "noise": flag})
+        if ids:
+            collection.update(ids=ids, metadatas=metadatas)
+            updated += len(ids)
+
+    print(f"[DONE] Updated {updated} / {total} chunks")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 import { useState } from "react";
-import { startExam, submitExam } from "./api";
+import { startExam, submitExamStream } from "./api";
 import Exam from "./components/Exam";
 import Result from "./components/Result";
 import "./styles.css";
@@ -7,6 +7,7 @@ import "./styles.css";
 export default function App() {
   const [level, setLevel] = useState("medium");
   const [exam, setExam] = useState(null);
+  const [token, setToken] = useState(null);
   const [result, setResult] = useState(null);
 
   async function begin() {
@@ -14,17 +15,28 @@ export default function App() {
     console.log("EXAM==>", data)
 
     setExam(data.exam);
+    setToken(data.token);
     setResult(null);
   }
 
   async function finish(answers) {
-    const res = await submitExam({
-      exam,
-      answers,
-      level,
+    await submitExamStream({ token, answers }, (event) => {
+      if (event.type === "explanation") {
+        setResult((prev) => {
+          const details = [...prev.details];
+          details[event.index] = {
+            ...details[event.index],
+            explanation: event.explanation,
+          };
+          return { ...prev, details };
+        });
+        return;
+      }
+
+      // Score event (or an error response)
+      setResult(event);
+      if (event.next_level) setLevel(event.next_level);
     });
-    setResult(res);
-    setLevel(res.next_level);
   }
 
   return (
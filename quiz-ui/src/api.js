@@ -17,3 +17,34 @@ export async function submitExam(payload) {
   });
   return res.json();
 }
+
+// Streams NDJSON events from /submit/stream: the score first, then one
+// event per explanation as it resolves.
+export async function submitExamStream(payload, onEvent) {
+  const res = await fetch(`${API_BASE}/submit/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(payload),
+  });
+
+  if (!res.ok) {
+    onEvent(await res.json());
+    return;
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split("\n");
+    buffer = lines.pop();
+    for (const line of lines) {
+      if (line.trim()) onEvent(JSON.parse(line));
+    }
+  }
+}
@@ -0,0 +1,68 @@
+import uvicorn
+
+from config import (
+    HOST,
+    PORT,
+    WORKERS,
+    SSL_CERTFILE,
+    SSL_KEYFILE,
+    EXAM_TOKEN_SECRET,
+    LLM_MAX_CONCURRENCY,
+    RETRIEVAL_BACKEND,
+)
+from exam.question_bank import MCQ_FILE, MCQ_DB_FILE, build_bank_db
+
+
+def prepare_shared_data():
+    """
+    Runs once in the parent before workers start, so every worker opens
+    the same read-only files (mmap'd, shared through the OS page cache)
+    instead of each parsing and holding its own copy.
+    """
+    if MCQ_FILE.exists() and not MCQ_DB_FILE.exists():
+        # Same ids as the JSON fallback (array positions), so safe to build
+        print(f"[SERVE] Building question bank index -> {MCQ_DB_FILE}")
+        build_bank_db()
+    elif MCQ_FILE.exists() and MCQ_DB_FILE.stat().st_mtime < MCQ_FILE.stat().st_mtime:
+        # A rebuild renumbers question ids under live exam tokens, so it is
+        # never done implicitly
+        print("[WARN] Question bank JSON is newer than its index; serving the "
+              "existing index. Run helpers/build_question_bank.py to rebuild")
+
+    if RETRIEVAL_BACKEND == "numpy":
+        from exam.numpy_index import NUMPY_INDEX_DIR
+
+        if not (NUMPY_INDEX_DIR / "embeddings.npy").exists():
+            raise SystemExit(
+                "RETRIEVAL_BACKEND=numpy but no export found; "
+                "run helpers/export_numpy_index.py first"
+            )
+    elif WORKERS > 1:
+        print("[WARN] Each worker opens its own Chroma client; "
+              "RETRIEVAL_BACKEND=numpy shares one mmap'd index instead")
+
+
+def main():
+    if WORKERS > 1 and not EXAM_TOKEN_SECRET:
+        # A per-process secret would reject tokens issued by other workers
+        raise SystemExit("EXAM_TOKEN_SECRET must be set when WORKERS > 1")
+
+    if WORKERS > LLM_MAX_CONCURRENCY:
+        # Every worker keeps at least one LLM slot of its own
+        print(f"[WARN] WORKERS={WORKERS} exceeds LLM_MAX_CONCURRENCY={LLM_MAX_CONCURRENCY}; "
+              f"up to {WORKERS} LLM calls may run at once")
+
+    prepare_shared_data()
+
+    uvicorn.run(
+        "api_main:app",
+        host=HOST,
+        port=PORT,
+        workers=WORKERS,
+        ssl_certfile=SSL_CERTFILE or None,
+        ssl_keyfile=SSL_KEYFILE or None,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,13 @@
 import chromadb
 from clients.llm_client import llm
 from clients.chroma_client import chroma
+from exam.bm25_index import bm25, rrf_merge
 
 # --- CONFIG ---
 COLLECTION_NAME = "pdf_docs"
 TOP_K = 5
 
 # --- CLIENTS ---
-chroma = chroma.client
 collection = chroma.get_collection(COLLECTION_NAME)
 
 # --- QUERY ---
@@ -17,8 +17,10 @@ def rag_query(question: str):
         query_texts=[question],
         n_results=TOP_K
     )
+    # Hybrid: fuse with BM25 so exact legal terms are not missed
+    results = rrf_merge(results, bm25.search([question], TOP_K))
 
-    contexts = results["documents"][0]
+    contexts = results["documents"][0][:TOP_K]
 
     # 2. Build prompt
     context_text = "\n\n".join(contexts)
@@ -0,0 +1,166 @@
+from pathlib import Path
+import asyncio
+import gc
+import sys
+import threading
+import time
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from exam.single_flight import AsyncSingleFlight, SingleFlight
+
+
+def test_async_concurrent_callers_share_one_fetch():
+    flights = AsyncSingleFlight()
+    fetched = []
+
+    async def fetch(keys):
+        fetched.append(list(keys))
+        await asyncio.sleep(0.05)
+        return {k: k.upper() for k in keys}
+
+    async def main():
+        return await asyncio.gather(*(flights.do_batch(["a", "b"], fetch) for _ in range(5)))
+
+    results = asyncio.run(main())
+
+    assert fetched == [["a", "b"]]
+    assert all(r == {"a": "A", "b": "B"} for r in results)
+    assert flights.stats == {"calls": 10, "executed": 2, "coalesced": 8}
+
+
+def test_async_batch_fetches_only_keys_not_in_flight():
+    flights = AsyncSingleFlight()
+    fetched = []
+
+    async def fetch(keys):
+        fetched.append(list(keys))
+        await asyncio.sleep(0.05)
+        return {k: k for k in keys}
+
+    async def main():
+        first = asyncio.ensure_future(flights.do_batch(["a"], fetch))
+        await asyncio.sleep(0)
+        await asyncio.gather(first, flights.do_batch(["a", "b"], fetch))
+
+    asyncio.run(main())
+
+    assert fetched == [["a"], ["b"]]
+    assert flights.stats["coalesced"] == 1
+
+
+def test_async_failure_reaches_every_caller_and_clears_flight():
+    flights = AsyncSingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise ValueError("down")
+
+    async def main():
+        results = await asyncio.gather(flights.do(1, boom), flights.do(1, boom),
+                                       return_exceptions=True)
+        # A new call after the failure starts a fresh flight
+        again = await flights.do(1, lambda: asyncio.sleep(0, result="ok"))
+        return results, again
+
+    results, again = asyncio.run(main())
+
+    assert [type(r) for r in results] == [ValueError, ValueError]
+    assert again == "ok"
+    assert flights.stats == {"calls": 3, "executed": 2, "coalesced": 1}
+
+
+def test_async_cancelled_caller_does_not_cancel_shared_fetch():
+    flights = AsyncSingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return 7
+
+    async def main():
+        first = asyncio.ensure_future(flights.do("k", slow))
+        second = asyncio.ensure_future(flights.do("k", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == 7
+
+
+def test_async_disconnected_caller_failure_is_not_unhandled():
+    flights = AsyncSingleFlight()
+    reported = []
+
+    async def boom():
+        await asyncio.sleep(0.02)
+        raise ValueError("down")
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, ctx: reported.append(ctx))
+        caller = asyncio.ensure_future(flights.do("k", boom))
+        await asyncio.sleep(0.005)
+        caller.cancel()
+        await asyncio.sleep(0.05)
+        gc.collect()
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+
+    assert reported == []
+
+
+def test_threads_share_one_fetch():
+    flights = SingleFlight()
+    fetched = []
+    results = []
+
+    def fetch(keys):
+        fetched.append(list(keys))
+        time.sleep(0.05)
+        return {k: k * 2 for k in keys}
+
+    threads = [
+        threading.Thread(target=lambda: results.append(flights.do_batch([1, 2], fetch)))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert fetched == [[1, 2]]
+    assert results == [{1: 2, 2: 4}] * 5
+    assert flights.stats == {"calls": 10, "executed": 2, "coalesced": 8}
+
+
+def test_thread_failure_reaches_waiters():
+    flights = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def boom():
+        started.set()
+        time.sleep(0.05)
+        raise ValueError("down")
+
+    def call():
+        try:
+            flights.do("k", boom)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=call)
+    follower.start()
+    leader.join()
+    follower.join()
+
+    assert len(errors) == 2
+    assert flights.stats["coalesced"] == 1
+    with pytest.raises(ValueError):
+        flights.do("k", boom)